@@ -8,6 +8,7 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+import io
 import sys
 import os
 
@@ -17,18 +18,25 @@ src_dir = os.path.join(current_dir, 'src')
 sys.path.insert(0, src_dir)
 
 try:
-    from file_handler import FileHandler
+    from file_handler import FileHandler, HAS_PYARROW
     from translator import TranslationService
     from matcher import ProductMatcher
     from utils import (
         display_data_summary, display_missing_values, validate_data_quality,
         create_similarity_chart, create_price_difference_chart, 
-        create_similarity_vs_price_chart, format_currency
+        create_similarity_vs_price_chart, format_currency, StreamlitProgress,
+        lazy_download_button, enable_copy_on_write
     )
 except ImportError as e:
     st.error(f"模組匯入錯誤: {e}")
     st.stop()
 
+# 共用的上傳資料以 assign 加欄位時不複製原本的欄位
+enable_copy_on_write()
+
+# 相似度門檻下限；比對時以此門檻保留候選比對，之後調整門檻不需重新比對
+MIN_SIMILARITY_THRESHOLD = 0.1
+
 # 頁面配置
 st.set_page_config(
     page_title="旅遊產品比對系統",
@@ -67,6 +75,11 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_translation_service() -> TranslationService:
+    """取得所有 session 共用的翻譯服務，啟動時依環境變數匯入快取並在背景預熱"""
+    return TranslationService.from_env(pack_requests=True, use_glossary=True)
+
 def initialize_session_state():
     """初始化 session state"""
     if 'df_a' not in st.session_state:
@@ -75,8 +88,14 @@ def initialize_session_state():
         st.session_state.df_b = None
     if 'matched_results' not in st.session_state:
         st.session_state.matched_results = None
+    if 'match_candidates' not in st.session_state:
+        st.session_state.match_candidates = None
+    if 'candidates_threshold' not in st.session_state:
+        st.session_state.candidates_threshold = MIN_SIMILARITY_THRESHOLD
     if 'translation_service' not in st.session_state:
-        st.session_state.translation_service = TranslationService()
+        st.session_state.translation_service = get_translation_service()
+    if 'cache_stats_baseline' not in st.session_state:
+        st.session_state.cache_stats_baseline = (0, 0)
 
 def main():
     """主函數"""
@@ -92,11 +111,12 @@ def main():
         
         similarity_threshold = st.slider(
             "相似度門檻",
-            min_value=0.1,
+            min_value=MIN_SIMILARITY_THRESHOLD,
             max_value=1.0,
             value=0.2,
             step=0.1,
-            help="只顯示相似度大於此門檻的結果"
+            help="只顯示相似度大於此門檻的結果；比對完成後調高門檻會即時更新結果，不需重新比對"
+                 "（前綴過濾引擎以此門檻比對，調低門檻需重新比對）"
         )
         
         max_token_diff = st.slider(
@@ -107,6 +127,51 @@ def main():
             help="詞彙數量差異超過此值將跳過比較"
         )
         
+        engine = st.selectbox(
+            "比對引擎",
+            ["index", "sparse", "prefix", "minhash"],
+            format_func=lambda x: {
+                "index": "倒排索引（逐筆）",
+                "sparse": "稀疏矩陣（批次，適合大量資料）",
+                "prefix": "前綴過濾（門檻 ≥ 0.5 時候選最少）",
+                "minhash": "MinHash LSH（近似，適合極大量資料）"
+            }[x],
+            help="前三種為精確比對，結果相同，差別在於速度；MinHash LSH 為近似比對，可能漏掉少數比對"
+        )
+        
+        lsh_bands, lsh_rows = 32, 4
+        if engine == "minhash":
+            lsh_bands = st.number_input("LSH 分段數 (bands)", min_value=1, max_value=256, value=32,
+                                        help="分段數越多召回率越高，但速度越慢")
+            lsh_rows = st.number_input("LSH 每段列數 (rows)", min_value=1, max_value=32, value=4,
+                                       help="每段列數越多候選越少、速度越快，但召回率越低")
+        
+        top_k = st.number_input(
+            "每個產品保留的候選數 (Top-K)",
+            min_value=1,
+            max_value=10,
+            value=1,
+            help="大於 1 時，每個供應商 A 產品會列出前 K 個最相似的供應商 B 產品，並加上名次欄位"
+        )
+        
+        blocking_keys = st.multiselect(
+            "額外分區條件",
+            ["price_band", "category"],
+            format_func=lambda x: {"price_band": "價格帶", "category": "產品類別 (category 欄位)"}[x],
+            help="除了國家之外，只比對同一價格帶或同一類別的產品，可大幅減少比對組合；兩個檔案缺少的欄位會自動略過"
+        )
+        
+        price_band_width = 100.0
+        if "price_band" in blocking_keys:
+            price_band_width = st.number_input("價格帶寬度", min_value=1.0, value=100.0, step=10.0,
+                                               help="價格落在同一區間（例如 0-100、100-200）的產品才會比對")
+        
+        use_parallel = st.checkbox(
+            "多核心平行比對",
+            value=False,
+            help="依國家切分比對工作並使用所有 CPU 核心平行處理"
+        )
+        
         st.header("📊 檔案格式說明")
         st.info("""
         **必要欄位:**
@@ -115,9 +180,21 @@ def main():
         - product_location_country (國家)
         - price (價格)
         
-        **支援格式:** CSV, Excel (.xlsx/.xls)
+        **選用欄位:**
+        - category (產品類別，可作為分區條件)
+        
+        **支援格式:** CSV, Excel (.xlsx/.xls), Parquet, Feather
         """)
     
+    # 比對時已保留候選比對，調整門檻只需重新篩選；低於候選比對的門檻時需重新比對
+    if st.session_state.match_candidates is not None:
+        candidates_threshold = st.session_state.candidates_threshold
+        if similarity_threshold < candidates_threshold:
+            st.sidebar.warning(f"⚠️ 目前結果以門檻 {candidates_threshold:.1f} 比對，調低門檻請重新執行比對")
+        st.session_state.matched_results = ProductMatcher.filter_candidates(
+            st.session_state.match_candidates, max(similarity_threshold, candidates_threshold)
+        )
+    
     # 主要內容區域
     tab1, tab2, tab3, tab4 = st.tabs(["📁 檔案上傳", "👀 資料預覽", "🔍 執行比對", "📈 結果分析"])
     
@@ -128,7 +205,8 @@ def main():
         preview_data_section()
     
     with tab3:
-        matching_section(similarity_threshold, max_token_diff)
+        matching_section(similarity_threshold, max_token_diff, engine, -1 if use_parallel else 1,
+                         lsh_bands, lsh_rows, blocking_keys, price_band_width, int(top_k))
     
     with tab4:
         results_analysis_section()
@@ -144,21 +222,25 @@ def upload_files_section():
         st.subheader("📤 供應商 A")
         uploaded_file_a = st.file_uploader(
             "選擇供應商 A 的產品檔案",
-            type=['csv', 'xlsx', 'xls'],
+            type=FileHandler.SUPPORTED_FORMATS,
             key="file_a",
-            help="上傳 CSV 或 Excel 檔案"
+            help="上傳 CSV、Excel、Parquet 或 Feather 檔案"
         )
         
         if uploaded_file_a:
             with st.spinner("正在處理檔案 A..."):
-                df_a = FileHandler.read_file(uploaded_file_a)
+                # 相同內容的檔案只解析一次，重新執行腳本時直接取用快取
+                df_a, missing_cols = FileHandler.load_file(uploaded_file_a)
                 if df_a is not None:
-                    is_valid, missing_cols = FileHandler.validate_columns(df_a)
-                    if is_valid:
-                        st.session_state.df_a = FileHandler.standardize_columns(df_a)
-                        st.success(f"✅ 檔案 A 上傳成功！共 {len(df_a)} 筆資料")
-                    else:
-                        st.error(f"❌ 檔案 A 缺少必要欄位: {', '.join(missing_cols)}")
+                    st.session_state.df_a = df_a
+                    st.success(f"✅ 檔案 A 上傳成功！共 {len(df_a)} 筆資料")
+                    info = FileHandler.get_data_info(df_a)
+                    st.caption(
+                        f"💾 記憶體用量 {info['memory_bytes'] / 1024 / 1024:.1f} MB"
+                        f"（精簡欄位型別節省 {info['memory_saved_bytes'] / 1024 / 1024:.1f} MB）"
+                    )
+                elif missing_cols:
+                    st.error(f"❌ 檔案 A 缺少必要欄位: {', '.join(missing_cols)}")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
@@ -166,21 +248,25 @@ def upload_files_section():
         st.subheader("📤 供應商 B")
         uploaded_file_b = st.file_uploader(
             "選擇供應商 B 的產品檔案",
-            type=['csv', 'xlsx', 'xls'],
+            type=FileHandler.SUPPORTED_FORMATS,
             key="file_b",
-            help="上傳 CSV 或 Excel 檔案"
+            help="上傳 CSV、Excel、Parquet 或 Feather 檔案"
         )
         
         if uploaded_file_b:
             with st.spinner("正在處理檔案 B..."):
-                df_b = FileHandler.read_file(uploaded_file_b)
+                # 相同內容的檔案只解析一次，重新執行腳本時直接取用快取
+                df_b, missing_cols = FileHandler.load_file(uploaded_file_b)
                 if df_b is not None:
-                    is_valid, missing_cols = FileHandler.validate_columns(df_b)
-                    if is_valid:
-                        st.session_state.df_b = FileHandler.standardize_columns(df_b)
-                        st.success(f"✅ 檔案 B 上傳成功！共 {len(df_b)} 筆資料")
-                    else:
-                        st.error(f"❌ 檔案 B 缺少必要欄位: {', '.join(missing_cols)}")
+                    st.session_state.df_b = df_b
+                    st.success(f"✅ 檔案 B 上傳成功！共 {len(df_b)} 筆資料")
+                    info = FileHandler.get_data_info(df_b)
+                    st.caption(
+                        f"💾 記憶體用量 {info['memory_bytes'] / 1024 / 1024:.1f} MB"
+                        f"（精簡欄位型別節省 {info['memory_saved_bytes'] / 1024 / 1024:.1f} MB）"
+                    )
+                elif missing_cols:
+                    st.error(f"❌ 檔案 B 缺少必要欄位: {', '.join(missing_cols)}")
         st.markdown('</div>', unsafe_allow_html=True)
 
 def preview_data_section():
@@ -231,7 +317,9 @@ def preview_data_section():
         else:
             st.info("📝 請上傳供應商 B 的檔案")
 
-def matching_section(similarity_threshold: float, max_token_diff: int):
+def matching_section(similarity_threshold: float, max_token_diff: int, engine: str = "index", n_jobs: int = 1,
+                     lsh_bands: int = 32, lsh_rows: int = 4, blocking_keys: list = None,
+                     price_band_width: float = 100.0, top_k: int = 1):
     """比對執行區域"""
     st.header("🔍 執行比對")
     
@@ -252,46 +340,115 @@ def matching_section(similarity_threshold: float, max_token_diff: int):
     with col1:
         translate_option = st.radio(
             "翻譯選項",
-            ["自動翻譯產品名稱", "假設已為英文"],
-            help="選擇是否需要將中文產品名稱翻譯為英文"
+            ["自動翻譯產品名稱", "假設已為英文", "直接比對中文名稱"],
+            help="選擇是否需要將中文產品名稱翻譯為英文；直接比對中文名稱時以字元二元組斷詞，完全不需翻譯"
+        )
+        lazy_translation = st.checkbox(
+            "只翻譯兩邊都有的國家",
+            value=True,
+            help="略過另一個供應商沒有的國家，並依國家逐一翻譯，翻譯完成的國家立即開始比對"
         )
     
     with col2:
-        if st.button("🗑️ 清除翻譯快取"):
-            st.session_state.translation_service.clear_cache()
+        # 翻譯快取由所有 session 共用，這裡只重設本 session 顯示的命中統計，不刪除快取內容
+        cache_info = st.session_state.translation_service.get_cache_info()
+        if st.button("🔄 重設快取統計"):
+            st.session_state.cache_stats_baseline = (cache_info['hits'], cache_info['misses'])
+        baseline_hits, baseline_misses = st.session_state.cache_stats_baseline
+        hits = cache_info['hits'] - baseline_hits
+        misses = cache_info['misses'] - baseline_misses
+        lookups = hits + misses
+        st.caption(
+            f"翻譯快取: {cache_info['cache_size']} 筆 · "
+            f"命中 {hits} / 未命中 {misses} ({hits / lookups if lookups else 0.0:.0%})"
+        )
+        
+        # 匯入會寫入所有 session 共用的快取，只提供匯出；匯入由管理員以 TRANSLATION_CACHE_SEED 於啟動時進行
+        with st.expander("💾 匯出翻譯快取"):
+            if st.button("準備匯出檔案"):
+                buffer = io.BytesIO()
+                count = st.session_state.translation_service.export_cache(buffer)
+                st.download_button(
+                    f"📥 下載翻譯快取 ({count} 筆)",
+                    data=buffer.getvalue(),
+                    file_name="translation_cache.jsonl.gz",
+                    mime="application/gzip"
+                )
+            st.caption("匯出的檔案可由管理員以環境變數 TRANSLATION_CACHE_SEED 在啟動時匯入")
     
     # 執行比對按鈕
     if st.button("🚀 開始比對", type="primary", use_container_width=True):
         with st.spinner("正在執行產品比對..."):
-            # 準備資料
-            df_a_work = st.session_state.df_a.copy()
-            df_b_work = st.session_state.df_b.copy()
+            # 準備資料（上傳的資料由所有 session 共用，新增欄位時以 assign 產生新的 DataFrame，不就地修改）
+            df_a_work = st.session_state.df_a
+            df_b_work = st.session_state.df_b
             
-            # 翻譯處理
-            if translate_option == "自動翻譯產品名稱":
+            # 翻譯處理（延遲翻譯時於比對中逐國翻譯）
+            translator = None
+            if translate_option == "自動翻譯產品名稱" and lazy_translation:
+                translator = st.session_state.translation_service
+            elif translate_option == "自動翻譯產品名稱":
                 st.info("🔤 正在翻譯產品名稱...")
                 
-                # 翻譯供應商 A
-                df_a_work['product_name_en'] = st.session_state.translation_service.translate_batch(
-                    df_a_work['product_name'].tolist(), show_progress=True
-                )
+                translation_service = st.session_state.translation_service
+                translation_stats = []
                 
-                # 翻譯供應商 B
-                df_b_work['product_name_en'] = st.session_state.translation_service.translate_batch(
-                    df_b_work['product_name'].tolist(), show_progress=True
-                )
-            else:
+                def translate_names(names):
+                    # 統計由本次呼叫返回；翻譯服務由所有 session 共用，不讀取共用的 last_batch_stats
+                    progress = StreamlitProgress("翻譯進度")
+                    names_en, stats = translation_service.translate_series(
+                        names, progress_callback=progress, return_stats=True
+                    )
+                    progress.close()
+                    translation_stats.append(stats)
+                    return names_en
+                
+                # 只翻譯缺少英文名稱的產品（正規化並去除重複後只翻譯不重複的名稱），與延遲翻譯的結果一致
+                df_a_work = ProductMatcher.fill_english_names(df_a_work, translate_names)
+                df_b_work = ProductMatcher.fill_english_names(df_b_work, translate_names)
+                api_calls_saved = sum(stats['api_calls_saved'] for stats in translation_stats)
+                api_requests = sum(stats['api_requests'] for stats in translation_stats)
+                st.caption(f"去除重複名稱，節省 {api_calls_saved} 次翻譯 API 呼叫；合併後共送出 {api_requests} 次請求")
+            elif translate_option == "假設已為英文":
                 # 假設產品名稱已為英文
-                df_a_work['product_name_en'] = df_a_work['product_name']
-                df_b_work['product_name_en'] = df_b_work['product_name']
+                df_a_work = df_a_work.assign(product_name_en=df_a_work['product_name'])
+                df_b_work = df_b_work.assign(product_name_en=df_b_work['product_name'])
             
             # 執行比對
             st.info("🎯 正在進行產品比對...")
-            matcher = ProductMatcher(similarity_threshold, max_token_diff)
-            matched_results = matcher.compare_products(df_a_work, df_b_work, show_progress=True)
+            matcher = ProductMatcher(similarity_threshold, max_token_diff, engine=engine, n_jobs=n_jobs,
+                                     lsh_bands=int(lsh_bands), lsh_rows=int(lsh_rows),
+                                     blocking_keys=blocking_keys, price_band_width=price_band_width,
+                                     top_k=top_k if top_k > 1 else None,
+                                     tokenizer='cjk_ngram' if translate_option == "直接比對中文名稱" else 'words')
+            progress = StreamlitProgress("比對進度")
+            matched_results = matcher.compare_products(
+                df_a_work, df_b_work, translator=translator, progress_callback=progress,
+                keep_candidates=True, min_threshold=MIN_SIMILARITY_THRESHOLD,
+                lazy_translation=lazy_translation
+            )
+            progress.close()
+            
+            if matcher.last_run_stats.get('lazy_translation'):
+                stats = matcher.last_run_stats
+                st.caption(
+                    f"延遲翻譯: {stats['shared_countries']} 個共同國家，略過 {stats['skipped_a']} 筆供應商A、"
+                    f"{stats['skipped_b']} 筆供應商B產品的翻譯"
+                )
+            
+            # 近似比對時顯示抽樣估算的召回率
+            if 'recall' in matcher.last_run_stats:
+                stats = matcher.last_run_stats
+                st.info(
+                    f"📐 近似比對召回率: {stats['recall']:.1%}"
+                    f"（抽樣 {stats['recall_sample_size']} 筆，精確比對 {stats['recall_expected_matches']} 組中找到 "
+                    f"{stats['recall_found_matches']} 組）"
+                )
             
-            # 儲存結果
+            # 儲存結果（候選比對供調整門檻時即時篩選）
             st.session_state.matched_results = matched_results
+            st.session_state.match_candidates = matcher.candidates
+            st.session_state.candidates_threshold = matcher.candidates_threshold
             
             if len(matched_results) > 0:
                 st.success(f"🎉 比對完成！找到 {len(matched_results)} 組相似產品")
@@ -302,6 +459,8 @@ def matching_section(similarity_threshold: float, max_token_diff: int):
                     'product_location_country', 'vendor_A_product_name', 
                     'vendor_B_product_name', 'jaccard_score', 'price_diff'
                 ]
+                if 'rank' in matched_results.columns:
+                    preview_columns.insert(2, 'rank')
                 st.dataframe(
                     matched_results[preview_columns].head(10),
                     use_container_width=True
@@ -369,29 +528,46 @@ def results_analysis_section():
     top_matches = matcher.get_top_matches(matched_df, 10)
     st.dataframe(top_matches, use_container_width=True)
     
-    # 結果匯出
+    # 結果匯出（按下下載時才產生檔案，同一份結果只產生一次）
     st.subheader("💾 匯出結果")
-    col1, col2 = st.columns(2)
+    file_stem = f"產品比對結果_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         # 匯出 CSV
-        csv_data = FileHandler.export_to_csv(matched_df)
-        st.download_button(
-            label="📁 下載 CSV 檔案",
-            data=csv_data,
-            file_name=f"產品比對結果_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
-        )
+        lazy_download_button("📁 下載 CSV 檔案", FileHandler.lazy_export(matched_df, 'csv'),
+                             f"{file_stem}.csv", "text/csv", key="export_csv", source=matched_df)
     
     with col2:
         # 匯出 Excel
-        excel_data = FileHandler.export_to_excel(matched_df)
-        st.download_button(
-            label="📊 下載 Excel 檔案",
-            data=excel_data,
-            file_name=f"產品比對結果_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        lazy_download_button("📊 下載 Excel 檔案", FileHandler.lazy_export(matched_df, 'xlsx'),
+                             f"{file_stem}.xlsx",
+                             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                             key="export_xlsx", source=matched_df)
+    
+    with col3:
+        # 匯出壓縮的 CSV
+        lazy_download_button("🗜️ 下載 CSV 壓縮檔 (gzip)", FileHandler.lazy_export(matched_df, 'csv.gz'),
+                             f"{file_stem}.csv.gz", "application/gzip", key="export_csv_gz", source=matched_df)
+    
+    col4, col5, col6 = st.columns(3)
+    
+    with col4:
+        lazy_download_button("🗜️ 下載 CSV 壓縮檔 (zip)", FileHandler.lazy_export(matched_df, 'zip'),
+                             f"{file_stem}.zip", "application/zip", key="export_zip", source=matched_df)
+    
+    if HAS_PYARROW:
+        with col5:
+            # 匯出 Parquet
+            lazy_download_button("🗃️ 下載 Parquet 檔案", FileHandler.lazy_export(matched_df, 'parquet'),
+                                 f"{file_stem}.parquet", "application/vnd.apache.parquet",
+                                 key="export_parquet", source=matched_df)
+        
+        with col6:
+            # 匯出 Feather（Arrow IPC）
+            lazy_download_button("🏹 下載 Feather 檔案", FileHandler.lazy_export(matched_df, 'feather'),
+                                 f"{file_stem}.feather", "application/vnd.apache.arrow.file",
+                                 key="export_feather", source=matched_df)
 
 if __name__ == "__main__":
     main()
@@ -9,14 +9,20 @@ from datetime import datetime, timedelta
 
 # 導入原有模組
 try:
-    from src.file_handler import FileHandler
+    from src.file_handler import FileHandler, HAS_PYARROW
     from src.matcher import ProductMatcher
     from src.translator import TranslationService
-    from src.utils import setup_logging
+    from src.utils import setup_logging, StreamlitProgress, lazy_download_button, enable_copy_on_write
 except ImportError as e:
     st.error(f"模組載入失敗: {e}")
     st.stop()
 
+# 共用的上傳資料以 assign 加欄位時不複製原本的欄位
+enable_copy_on_write()
+
+# 相似度門檻下限；比對時以此門檻保留候選比對，之後調整門檻不需重新比對
+MIN_SIMILARITY_THRESHOLD = 0.1
+
 # 設定頁面
 st.set_page_config(
     page_title="旅遊產品比對系統",
@@ -70,6 +76,12 @@ def check_password():
     return False
 
 
+@st.cache_resource
+def get_translation_service() -> TranslationService:
+    """取得所有 session 共用的翻譯服務（翻譯快取存放在共用的 SQLite 檔案，啟動時依環境變數匯入與預熱）"""
+    return TranslationService.from_env(pack_requests=True, use_glossary=True)
+
+
 def add_usage_tracking():
     """添加使用統計"""
     if "usage_count" not in st.session_state:
@@ -117,18 +129,25 @@ def main():
             st.subheader("供應商 A")
             uploaded_file_a = st.file_uploader(
                 "選擇供應商 A 的檔案",
-                type=['csv', 'xlsx', 'xls'],
+                type=FileHandler.SUPPORTED_FORMATS,
                 key="file_a",
-                help="支援 CSV 和 Excel 格式"
+                help="支援 CSV、Excel、Parquet 和 Feather 格式"
             )
 
             if uploaded_file_a:
                 try:
-                    df_a = file_handler.read_file(uploaded_file_a)
+                    df_a, missing_cols = file_handler.load_file(uploaded_file_a)
                     if df_a is None:
+                        if missing_cols:
+                            raise ValueError(f"缺少必要欄位: {', '.join(missing_cols)}")
                         raise ValueError("檔案格式或內容不正確")
-                    st.session_state.df_a = file_handler.standardize_columns(df_a)
+                    st.session_state.df_a = df_a
                     st.success(f"✅ 檔案載入成功！共 {len(df_a)} 筆資料")
+                    info = file_handler.get_data_info(df_a)
+                    st.caption(
+                        f"💾 記憶體用量 {info['memory_bytes'] / 1024 / 1024:.1f} MB"
+                        f"（精簡欄位型別節省 {info['memory_saved_bytes'] / 1024 / 1024:.1f} MB）"
+                    )
                 except Exception as e:
                     st.error(f"❌ 檔案載入失敗: {str(e)}")
 
@@ -136,18 +155,25 @@ def main():
             st.subheader("供應商 B")
             uploaded_file_b = st.file_uploader(
                 "選擇供應商 B 的檔案",
-                type=['csv', 'xlsx', 'xls'],
+                type=FileHandler.SUPPORTED_FORMATS,
                 key="file_b",
-                help="支援 CSV 和 Excel 格式"
+                help="支援 CSV、Excel、Parquet 和 Feather 格式"
             )
 
             if uploaded_file_b:
                 try:
-                    df_b = file_handler.read_file(uploaded_file_b)
+                    df_b, missing_cols = file_handler.load_file(uploaded_file_b)
                     if df_b is None:
+                        if missing_cols:
+                            raise ValueError(f"缺少必要欄位: {', '.join(missing_cols)}")
                         raise ValueError("檔案格式或內容不正確")
-                    st.session_state.df_b = file_handler.standardize_columns(df_b)
+                    st.session_state.df_b = df_b
                     st.success(f"✅ 檔案載入成功！共 {len(df_b)} 筆資料")
+                    info = file_handler.get_data_info(df_b)
+                    st.caption(
+                        f"💾 記憶體用量 {info['memory_bytes'] / 1024 / 1024:.1f} MB"
+                        f"（精簡欄位型別節省 {info['memory_saved_bytes'] / 1024 / 1024:.1f} MB）"
+                    )
                 except Exception as e:
                     st.error(f"❌ 檔案載入失敗: {str(e)}")
 
@@ -177,11 +203,11 @@ def main():
             with col1:
                 similarity_threshold = st.slider(
                     "相似度門檻",
-                    min_value=0.1,
+                    min_value=MIN_SIMILARITY_THRESHOLD,
                     max_value=1.0,
                     value=0.5,
                     step=0.1,
-                    help="低於此門檻的比對結果將被過濾"
+                    help="低於此門檻的比對結果將被過濾；比對完成後調整門檻會即時更新結果"
                 )
 
             with col2:
@@ -191,6 +217,15 @@ def main():
                     help="將中文產品名稱翻譯成英文進行比對"
                 )
 
+            # 比對時已保留候選比對，調整門檻只需重新篩選；低於候選比對的門檻時需重新比對
+            if 'match_candidates' in st.session_state:
+                candidates_threshold = st.session_state.candidates_threshold
+                if similarity_threshold < candidates_threshold:
+                    st.warning(f"⚠️ 目前結果以門檻 {candidates_threshold:.1f} 比對，調低門檻請重新執行比對")
+                st.session_state.results = ProductMatcher.filter_candidates(
+                    st.session_state.match_candidates, max(similarity_threshold, candidates_threshold)
+                )
+
             # 執行比對按鈕
             if st.button("🚀 開始比對", type="primary"):
                 with st.spinner("正在執行比對，請稍候..."):
@@ -199,18 +234,27 @@ def main():
                         st.session_state.usage_count += 1
 
                         # 初始化比對器
-                        matcher = ProductMatcher(similarity_threshold=similarity_threshold)
-                        translator = TranslationService() if translate_names else None
+                        # Cloud Run 執行個體有多個 vCPU，依國家分片平行比對
+                        matcher = ProductMatcher(similarity_threshold=similarity_threshold, n_jobs=-1)
+                        translator = get_translation_service() if translate_names else None
 
                         # 執行比對
+                        progress = StreamlitProgress("比對進度")
                         results = matcher.compare_products(
                             st.session_state.df_a,
                             st.session_state.df_b,
                             similarity_threshold=similarity_threshold,
-                            translator=translator
+                            translator=translator,
+                            progress_callback=progress,
+                            keep_candidates=True,
+                            min_threshold=MIN_SIMILARITY_THRESHOLD,
+                            lazy_translation=True
                         )
+                        progress.close()
 
                         st.session_state.results = results
+                        st.session_state.match_candidates = matcher.candidates
+                        st.session_state.candidates_threshold = matcher.candidates_threshold
                         st.success("✅ 比對完成！")
 
                         # 顯示基本統計
@@ -232,26 +276,37 @@ def main():
                 st.subheader("🔍 比對結果")
                 st.dataframe(results)
 
-                # 下載按鈕
-                col1, col2 = st.columns(2)
+                # 下載按鈕（按下下載時才產生檔案，同一份結果只產生一次）
+                file_stem = f"比對結果_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                col1, col2, col3 = st.columns(3)
 
                 with col1:
-                    csv_data = file_handler.export_to_csv(results)
-                    st.download_button(
-                        label="📥 下載 CSV",
-                        data=csv_data,
-                        file_name=f"比對結果_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
-                    )
+                    lazy_download_button("📥 下載 CSV", file_handler.lazy_export(results, 'csv'),
+                                         f"{file_stem}.csv", "text/csv", key="export_csv", source=results)
 
                 with col2:
-                    excel_data = file_handler.export_to_excel(results)
-                    st.download_button(
-                        label="📥 下載 Excel",
-                        data=excel_data,
-                        file_name=f"比對結果_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+                    lazy_download_button("📥 下載 Excel", file_handler.lazy_export(results, 'xlsx'),
+                                         f"{file_stem}.xlsx",
+                                         "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                         key="export_xlsx", source=results)
+
+                with col3:
+                    lazy_download_button("📥 下載 CSV 壓縮檔", file_handler.lazy_export(results, 'csv.gz'),
+                                         f"{file_stem}.csv.gz", "application/gzip", key="export_csv_gz",
+                                         source=results)
+
+                if HAS_PYARROW:
+                    col4, col5, col6 = st.columns(3)
+
+                    with col4:
+                        lazy_download_button("📥 下載 Parquet", file_handler.lazy_export(results, 'parquet'),
+                                             f"{file_stem}.parquet", "application/vnd.apache.parquet",
+                                             key="export_parquet", source=results)
+
+                    with col5:
+                        lazy_download_button("📥 下載 Feather", file_handler.lazy_export(results, 'feather'),
+                                             f"{file_stem}.feather", "application/vnd.apache.arrow.file",
+                                             key="export_feather", source=results)
 
                 # 分析統計
                 st.subheader("📈 統計分析")
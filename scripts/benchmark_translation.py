@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+並行翻譯效能評估
+以本機翻譯替身（StubBackend）模擬網路延遲與 API 限流，比較不同同時請求數的批次翻譯時間，不需網路
+
+用法:
+    python scripts/benchmark_translation.py --names 200 --latency 0.15 --throttle-every 17 --workers 1 8
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+# 讓腳本可從專案根目錄或 scripts 目錄直接執行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.translation_backends import StubBackend
+from src.translator import TranslationService
+
+
+class ThrottlingStubBackend(StubBackend):
+    """每 N 次呼叫回傳一次限流錯誤（HTTP 429）的翻譯替身"""
+
+    def __init__(self, latency: float, throttle_every: int = 0):
+        """
+        初始化翻譯替身
+
+        Args:
+            latency: 每次呼叫模擬的網路延遲秒數
+            throttle_every: 每幾次呼叫模擬一次限流錯誤，0 表示不模擬
+        """
+        super().__init__(latency=latency)
+        self.throttle_every = throttle_every
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def translate(self, text: str) -> str:
+        with self._lock:
+            self.calls += 1
+            throttle = self.throttle_every and self.calls % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+        if throttle:
+            time.sleep(self.latency)
+            raise RuntimeError("429 Too Many Requests")
+        if self.latency:
+            time.sleep(self.latency)
+        # 逐行翻譯，保留合併請求的分隔符號
+        return '\n'.join(f"en:{line}" for line in text.split('\n'))
+
+
+def run(names, workers: int, args) -> tuple:
+    """
+    以指定的同時請求數翻譯一次（每次使用新的記憶體快取）
+
+    Returns:
+        tuple: (翻譯結果, 秒數, 翻譯替身)
+    """
+    backend = ThrottlingStubBackend(args.latency, args.throttle_every)
+    service = TranslationService(backend=backend, rate_limit=args.rate_limit, max_workers=workers,
+                                 backoff_base=args.backoff_base, pack_requests=args.pack)
+    start = time.perf_counter()
+    translated = service.translate_batch(names)
+    return translated, time.perf_counter() - start, backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="並行翻譯效能評估（StubBackend，不需網路）")
+    parser.add_argument('--names', type=int, default=200, help="不重複的產品名稱數")
+    parser.add_argument('--latency', type=float, default=0.15, help="每次請求模擬的延遲秒數")
+    parser.add_argument('--throttle-every', type=int, default=17, help="每幾次請求模擬一次限流錯誤（0 為不模擬）")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8], help="要比較的同時請求數")
+    parser.add_argument('--rate-limit', type=float, default=50.0, help="每秒請求數上限")
+    parser.add_argument('--backoff-base', type=float, default=0.2, help="限流重試的退避基準秒數")
+    parser.add_argument('--pack', action='store_true', help="將多個名稱合併成一次請求")
+    args = parser.parse_args()
+
+    names = [f"產品 {i} 一日遊" for i in range(args.names)]
+    baseline = None
+    for workers in args.workers:
+        translated, seconds, backend = run(names, workers, args)
+        if baseline is None:
+            baseline = translated
+        print(f"workers={workers:<3d} {seconds:7.2f} s  calls={backend.calls:<5d} "
+              f"throttled={backend.throttled:<4d} same_output={translated == baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,17 +5,223 @@
 處理 CSV 和 Excel 檔案的上傳、讀取和驗證
 """
 
+import numpy as np
 import pandas as pd
 import streamlit as st
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List, Callable
+import codecs
+import csv
+import hashlib
 import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+import openpyxl
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+# Arrow 字串型別（缺失值為 NaN，與 object 字串欄位行為一致）；沒有 pyarrow 或舊版 pandas 時不轉換
+try:
+    ARROW_STRING_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan) if HAS_PYARROW else None
+except TypeError:
+    ARROW_STRING_DTYPE = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# 已解析上傳檔案的快取上限（MB），可用環境變數 INGESTION_CACHE_MAX_MB 覆蓋
+DEFAULT_INGESTION_CACHE_MB = 512
+
+# 已產生匯出檔案的快取上限（MB），可用環境變數 EXPORT_CACHE_MAX_MB 覆蓋
+DEFAULT_EXPORT_CACHE_MB = 256
+
+# 資料概況的快取上限（MB），可用環境變數 PROFILE_CACHE_MAX_MB 覆蓋
+DEFAULT_PROFILE_CACHE_MB = 16
+
+
+class IngestionCache:
+    """以上傳內容雜湊為鍵的已解析檔案快取，行程內所有 session 共用，依記憶體用量淘汰最久未使用的項目"""
+    
+    # 上限的環境變數與預設值（MB）
+    MAX_MB_ENV = 'INGESTION_CACHE_MAX_MB'
+    DEFAULT_MAX_MB = DEFAULT_INGESTION_CACHE_MB
+    
+    def __init__(self, max_bytes: int = None):
+        """
+        初始化解析快取
+        
+        Args:
+            max_bytes: 快取內容的記憶體上限（可選，預設為環境變數 MAX_MB_ENV 或 DEFAULT_MAX_MB）
+        """
+        if max_bytes is None:
+            max_bytes = int(os.getenv(self.MAX_MB_ENV, self.DEFAULT_MAX_MB)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Tuple[Any, int]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _sizeof(value: pd.DataFrame) -> int:
+        """計算快取項目佔用的位元組數"""
+        return int(value.memory_usage(deep=True).sum())
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        查詢快取的項目
+        
+        Args:
+            key: 內容雜湊
+            
+        Returns:
+            快取的項目（已解析的 DataFrame），沒有時為 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: str, value: Any) -> None:
+        """
+        儲存項目；單一項目超過上限時不快取
+        
+        Args:
+            key: 內容雜湊
+            value: 要快取的項目（已標準化的 DataFrame）
+        """
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            logger.info("快取項目 %.1f MB 超過上限，不快取", size / 1024 / 1024)
+            return
+        
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+    
+    def clear(self) -> None:
+        """清除所有快取與命中統計"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def info(self) -> Dict[str, Any]:
+        """
+        獲取快取統計資訊
+        
+        Returns:
+            Dict: 檔案數、使用與上限位元組數、命中與未命中次數
+        """
+        return {
+            'cached_files': len(self),
+            'size_bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+class ExportCache(IngestionCache):
+    """以結果內容與匯出格式為鍵的匯出檔案快取，同一份結果每種格式只產生一次"""
+    
+    MAX_MB_ENV = 'EXPORT_CACHE_MAX_MB'
+    DEFAULT_MAX_MB = DEFAULT_EXPORT_CACHE_MB
+    
+    @staticmethod
+    def _sizeof(value: bytes) -> int:
+        return len(value)
+
+
+class ProfileCache(IngestionCache):
+    """以資料集雜湊為鍵的資料概況快取"""
+    
+    MAX_MB_ENV = 'PROFILE_CACHE_MAX_MB'
+    DEFAULT_MAX_MB = DEFAULT_PROFILE_CACHE_MB
+    
+    @staticmethod
+    def _sizeof(value: Dict[str, Any]) -> int:
+        # 概況的大小與欄位數成正比，以每欄約 1 KB 估算
+        return 1024 * (1 + value['total_columns'])
 
 
 class FileHandler:
     """檔案處理類別"""
     
     REQUIRED_COLUMNS = ['product_id', 'product_name', 'product_location_country', 'price']
-    SUPPORTED_FORMATS = ['csv', 'xlsx', 'xls']
+    OPTIONAL_COLUMNS = ['category']  # 有提供時保留，可作為比對的額外分區鍵
+    SUPPORTED_FORMATS = ['csv', 'xlsx', 'xls', 'parquet', 'feather', 'arrow']
+    
+    # 欄式格式（Parquet、Arrow IPC / Feather），需要 pyarrow
+    COLUMNAR_FORMATS = ['parquet', 'feather', 'arrow']
+    
+    # 讀檔時一併保留的欄位（已翻譯的英文名稱可省去翻譯）
+    EXTRA_COLUMNS = ['product_name_en']
+    
+    # 讀檔時明確指定的欄位型別，避免逐欄推斷
+    COLUMN_DTYPES = {
+        'product_id': str,
+        'product_name': str,
+        'product_location_country': str,
+        'price': 'float64',
+        'category': str,
+        'product_name_en': str
+    }
+    
+    # CSV 編碼候選（依序嘗試），以及偵測編碼時讀取的位元組數
+    CSV_ENCODINGS = ['utf-8', 'big5', 'gbk']
+    ENCODING_SAMPLE_SIZE = 64 * 1024
+    
+    # 重複值多時轉為類別型別的欄位
+    CATEGORICAL_COLUMNS = ['product_location_country', 'category']
+    
+    # 已解析上傳檔案的共用快取
+    ingestion_cache = IngestionCache()
+    
+    # 已產生匯出檔案的共用快取
+    export_cache = ExportCache()
+    
+    # 資料概況的共用快取
+    profile_cache = ProfileCache()
+    
+    # 匯出格式 → 匯出方法名稱
+    EXPORT_FORMATS = {
+        'csv': 'export_to_csv',
+        'csv.gz': 'export_to_csv_gzip',
+        'zip': 'export_to_csv_zip',
+        'xlsx': 'export_to_excel',
+        'parquet': 'export_to_parquet',
+        'feather': 'export_to_feather'
+    }
     
     @staticmethod
     def validate_file_format(file) -> bool:
@@ -34,6 +240,290 @@ class FileHandler:
         file_extension = file.name.lower().split('.')[-1]
         return file_extension in FileHandler.SUPPORTED_FORMATS
     
+    @staticmethod
+    def detect_encoding(sample: bytes) -> str:
+        """
+        從檔案開頭的位元組樣本偵測 CSV 編碼
+        
+        Args:
+            sample: 檔案開頭的位元組
+            
+        Returns:
+            str: 第一個能完整解碼樣本的編碼（樣本結尾被截斷的多位元組字元不視為錯誤）
+        """
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        
+        for encoding in FileHandler.CSV_ENCODINGS:
+            try:
+                codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        return FileHandler.CSV_ENCODINGS[-1]
+    
+    @staticmethod
+    def _is_wanted_column(column: Any) -> bool:
+        """判斷原始欄位是否為必要、選用或額外欄位（不分大小寫）"""
+        wanted = FileHandler.REQUIRED_COLUMNS + FileHandler.OPTIONAL_COLUMNS + FileHandler.EXTRA_COLUMNS
+        return isinstance(column, str) and column.lower() in {col.lower() for col in wanted}
+    
+    @staticmethod
+    def _wanted_columns(header: List[str]) -> List[str]:
+        """
+        從標題列找出要讀取的欄位（不分大小寫比對必要、選用與額外欄位）
+        
+        Args:
+            header: 檔案的原始欄位名稱
+            
+        Returns:
+            List[str]: 要讀取的原始欄位名稱；一個都找不到時為空列表
+        """
+        return [col for col in header if FileHandler._is_wanted_column(col)]
+    
+    @staticmethod
+    def _column_dtypes(columns: List[str]) -> Dict[str, Any]:
+        """依標準欄位名稱取得原始欄位的型別"""
+        dtypes = {}
+        for col in columns:
+            dtype = FileHandler.COLUMN_DTYPES.get(col.lower())
+            if dtype is not None:
+                dtypes[col] = dtype
+        return dtypes
+    
+    @staticmethod
+    def read_csv(file) -> pd.DataFrame:
+        """
+        單次解析讀取 CSV：先以樣本偵測編碼與標題列，只讀取需要的欄位並指定型別
+        
+        有安裝 pyarrow 時使用 pyarrow 解析引擎。
+        
+        Args:
+            file: 檔案物件或路徑
+            
+        Returns:
+            pd.DataFrame: 讀取的資料
+        """
+        if isinstance(file, str) or hasattr(file, '__fspath__'):
+            with open(file, 'rb') as f:
+                return FileHandler.read_csv(f)
+        
+        sample = file.read(FileHandler.ENCODING_SAMPLE_SIZE)
+        file.seek(0)
+        encoding = FileHandler.detect_encoding(sample)
+        
+        # 標題列只需解析樣本的第一行
+        first_line = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample).splitlines()[:1]
+        header = next(csv.reader(first_line), [])
+        usecols = FileHandler._wanted_columns(header) or None
+        
+        options = {
+            'encoding': encoding,
+            'usecols': usecols,
+            'dtype': FileHandler._column_dtypes(usecols or header)
+        }
+        try:
+            return FileHandler._parse_csv(file, **options)
+        except UnicodeDecodeError:
+            # 樣本之後才出現無法解碼的內容（極少見），改用下一個候選編碼
+            remaining = FileHandler.CSV_ENCODINGS[FileHandler.CSV_ENCODINGS.index(encoding) + 1:] \
+                if encoding in FileHandler.CSV_ENCODINGS else FileHandler.CSV_ENCODINGS[1:]
+            if not remaining:
+                raise
+            logger.info("CSV 無法以 %s 完整解碼，改用 %s", encoding, remaining[0])
+            file.seek(0)
+            options['encoding'] = remaining[0]
+            return FileHandler._parse_csv(file, **options)
+        except ValueError as e:
+            # 價格欄位含非數字內容時改為自動推斷型別
+            logger.info("以指定型別讀取 CSV 失敗，改為自動推斷價格型別: %s", e)
+            file.seek(0)
+            options['dtype'] = {col: dtype for col, dtype in options['dtype'].items() if dtype is str}
+            return FileHandler._parse_csv(file, **options)
+    
+    @staticmethod
+    def _parse_csv(file, encoding: str, usecols: Optional[List[str]], dtype: Dict[str, Any]) -> pd.DataFrame:
+        """
+        以指定的編碼、欄位與型別解析 CSV；有安裝 pyarrow 時直接使用 pyarrow.csv
+        
+        pandas 的 pyarrow 引擎會先推斷型別再轉換，編號 001 會先被解析成整數 1 而遺失前導零，
+        因此改以 pyarrow.csv 在解析時就指定欄位型別，結果與 C 引擎一致。
+        
+        Args:
+            file: 檔案物件
+            encoding: 檔案編碼
+            usecols: 要讀取的原始欄位名稱（None 表示全部）
+            dtype: 原始欄位名稱 → 型別
+            
+        Returns:
+            pd.DataFrame: 讀取的資料
+        """
+        if not HAS_PYARROW:
+            return pd.read_csv(file, encoding=encoding, usecols=usecols, dtype=dtype)
+        
+        column_types = {
+            col: pa.string() if col_dtype is str else pa.from_numpy_dtype(np.dtype(col_dtype))
+            for col, col_dtype in dtype.items()
+        }
+        try:
+            table = pa_csv.read_csv(
+                file,
+                read_options=pa_csv.ReadOptions(encoding=encoding),
+                # 與 pandas 相同，空字串與 NA 等字樣視為缺失值
+                convert_options=pa_csv.ConvertOptions(column_types=column_types, include_columns=usecols or [],
+                                                      strings_can_be_null=True)
+            )
+        except pa.ArrowInvalid as e:
+            # UTF-8 不經轉碼，無法解碼的內容回報為 ArrowInvalid；轉為 UnicodeDecodeError 讓呼叫端改用下一個編碼
+            if 'invalid UTF8' in str(e):
+                raise UnicodeDecodeError(encoding, b'', 0, 1, str(e)) from e
+            raise
+        return table.to_pandas()
+    
+    @staticmethod
+    def _read_xlsx_rows(file) -> pd.DataFrame:
+        """
+        以 openpyxl 唯讀模式逐列讀取 xlsx 第一個工作表，只保留需要的欄位
+        
+        Args:
+            file: 檔案物件或路徑
+            
+        Returns:
+            pd.DataFrame: 讀取的資料
+        """
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            header = next(sheet.iter_rows(max_row=1, values_only=True), None)
+            if header is None:
+                return pd.DataFrame()
+            
+            # 同名欄位只取第一個
+            positions: Dict[str, int] = {}
+            for i, col in enumerate(header):
+                if FileHandler._is_wanted_column(col):
+                    positions.setdefault(col, i)
+            if not positions:
+                return pd.DataFrame()
+            
+            # 只走訪需要欄位所在的範圍，其餘儲存格不會被建立
+            first, last = min(positions.values()), max(positions.values())
+            offsets = [(name, i - first) for name, i in positions.items()]
+            columns: Dict[str, list] = {name: [] for name in positions}
+            num_rows = 0
+            rows = sheet.iter_rows(min_row=2, min_col=first + 1, max_col=last + 1, values_only=True)
+            for count, row in enumerate(rows, start=1):
+                # 中間需要的欄位都空白的列保留，與 pandas / calamine 的結果一致
+                values = [row[offset] if offset < len(row) else None for _, offset in offsets]
+                for (name, _), value in zip(offsets, values):
+                    columns[name].append(value)
+                if any(value is not None for value in values):
+                    num_rows = count
+            
+            # 唯讀模式會回傳到工作表記錄大小為止的列（含只有格式的空白列），與 pandas 相同去除結尾的空白列
+            return pd.DataFrame({name: values[:num_rows] for name, values in columns.items()})
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def read_excel(file) -> pd.DataFrame:
+        """
+        讀取 Excel：依標題列不分大小寫找出需要的欄位，只讀取這些欄位
+        
+        有安裝 python-calamine 時使用 calamine 引擎；否則 xlsx 以 openpyxl 唯讀模式逐列讀取，
+        xls 交給 pandas 預設引擎。
+        
+        Args:
+            file: 檔案物件或路徑
+            
+        Returns:
+            pd.DataFrame: 讀取的資料
+        """
+        name = str(getattr(file, 'name', file)).lower()
+        
+        if HAS_CALAMINE:
+            try:
+                return pd.read_excel(file, engine='calamine', usecols=FileHandler._is_wanted_column)
+            except (ValueError, ImportError) as e:
+                # 舊版 pandas 不支援 calamine 引擎
+                logger.info("無法使用 calamine 讀取 Excel，改用其他引擎: %s", e)
+                if hasattr(file, 'seek'):
+                    file.seek(0)
+        
+        if name.endswith('.xlsx'):
+            return FileHandler._read_xlsx_rows(file)
+        return pd.read_excel(file, usecols=FileHandler._is_wanted_column)
+    
+    @staticmethod
+    def _arrow_source(file):
+        """
+        取得 pyarrow 可讀取的來源：路徑以記憶體映射開啟，上傳的檔案以 getbuffer() 直接包裝其記憶體，皆不複製資料
+        
+        返回的來源需以 with 使用，結束時關閉記憶體映射。
+        
+        Args:
+            file: 檔案物件或路徑
+            
+        Returns:
+            pyarrow 可讀取的來源
+        """
+        if isinstance(file, str) or hasattr(file, '__fspath__'):
+            return pa.memory_map(str(file))
+        data = file.getbuffer() if hasattr(file, 'getbuffer') else file.read()
+        return pa.BufferReader(data)
+    
+    @staticmethod
+    def read_columnar(file, file_format: str) -> pd.DataFrame:
+        """
+        讀取 Parquet 或 Arrow IPC（Feather）檔案，只讀取需要的欄位
+        
+        Args:
+            file: 檔案物件或路徑
+            file_format: 'parquet'、'feather' 或 'arrow'
+            
+        Returns:
+            pd.DataFrame: 讀取的資料
+        """
+        if not HAS_PYARROW:
+            raise ImportError("讀取 Parquet / Feather 檔案需要安裝 pyarrow")
+        
+        # 同一個來源只開啟一次，讀取完成後關閉
+        with FileHandler._arrow_source(file) as source:
+            if file_format == 'parquet':
+                parquet_file = pq.ParquetFile(source)
+                columns = FileHandler._wanted_columns(parquet_file.schema_arrow.names) or None
+                table = parquet_file.read(columns=columns)
+            else:
+                schema = pa.ipc.open_file(source).schema
+                columns = FileHandler._wanted_columns(schema.names) or None
+                table = feather.read_table(source, columns=columns)
+            
+            return table.to_pandas(split_blocks=True)
+    
+    @staticmethod
+    def read_path(path: str) -> pd.DataFrame:
+        """
+        依副檔名以對應的讀取器讀取本機檔案（與上傳檔案相同的編碼偵測與欄位挑選）
+        
+        Args:
+            path: 檔案路徑
+            
+        Returns:
+            pd.DataFrame: 讀取的資料
+            
+        Raises:
+            ValueError: 不支援的檔案格式
+        """
+        file_extension = str(path).lower().split('.')[-1]
+        
+        if file_extension == 'csv':
+            return FileHandler.read_csv(path)
+        if file_extension in ['xlsx', 'xls']:
+            return FileHandler.read_excel(path)
+        if file_extension in FileHandler.COLUMNAR_FORMATS:
+            return FileHandler.read_columnar(path, file_extension)
+        raise ValueError(f"不支援的檔案格式: {path}，支援格式: {', '.join(FileHandler.SUPPORTED_FORMATS)}")
+    
     @staticmethod
     def read_file(file) -> Optional[pd.DataFrame]:
         """
@@ -53,19 +543,13 @@ class FileHandler:
             file_extension = file.name.lower().split('.')[-1]
             
             if file_extension == 'csv':
-                # 嘗試不同的編碼格式
-                try:
-                    df = pd.read_csv(file, encoding='utf-8')
-                except UnicodeDecodeError:
-                    file.seek(0)  # 重置檔案指標
-                    try:
-                        df = pd.read_csv(file, encoding='big5')
-                    except UnicodeDecodeError:
-                        file.seek(0)
-                        df = pd.read_csv(file, encoding='gbk')
+                df = FileHandler.read_csv(file)
             
             elif file_extension in ['xlsx', 'xls']:
-                df = pd.read_excel(file)
+                df = FileHandler.read_excel(file)
+            
+            elif file_extension in FileHandler.COLUMNAR_FORMATS:
+                df = FileHandler.read_columnar(file, file_extension)
             
             return df
             
@@ -73,6 +557,61 @@ class FileHandler:
             st.error(f"❌ 檔案讀取失敗: {str(e)}")
             return None
     
+    @staticmethod
+    def content_hash(file) -> str:
+        """
+        計算上傳檔案內容的雜湊值（含副檔名，相同位元組以不同格式解析時不會共用結果）
+        
+        Args:
+            file: 上傳的檔案物件
+            
+        Returns:
+            str: 雜湊值
+        """
+        data = file.getbuffer() if hasattr(file, 'getbuffer') else file.read()
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        digest = hashlib.sha256(data)
+        digest.update(file.name.lower().split('.')[-1].encode('utf-8'))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def load_file(file) -> Tuple[Optional[pd.DataFrame], list]:
+        """
+        讀取、驗證並標準化上傳的檔案；相同內容的檔案只解析一次，結果由所有 session 共用
+        
+        共用的 DataFrame 不可就地修改，需要新增欄位時請先複製。
+        
+        Args:
+            file: 上傳的檔案物件
+            
+        Returns:
+            Tuple[Optional[pd.DataFrame], list]: (標準化後的資料, 缺少的欄位列表)；
+            讀取失敗或缺少必要欄位時資料為 None
+        """
+        if not FileHandler.validate_file_format(file):
+            return FileHandler.read_file(file), []
+        
+        key = FileHandler.content_hash(file)
+        df = FileHandler.ingestion_cache.get(key)
+        if df is not None:
+            return df, []
+        
+        df = FileHandler.read_file(file)
+        if df is None:
+            return None, []
+        
+        is_valid, missing_columns = FileHandler.validate_columns(df)
+        if not is_valid:
+            return None, missing_columns
+        
+        df = FileHandler.compact_dtypes(FileHandler.standardize_columns(df))
+        # 讀檔時即計算資料概況，預覽頁面直接取用
+        df.attrs['dataset_hash'] = key
+        FileHandler.profile_cache.put(key, FileHandler.profile_data(df))
+        FileHandler.ingestion_cache.put(key, df)
+        return df, []
+    
     @staticmethod
     def validate_columns(df: pd.DataFrame) -> Tuple[bool, list]:
         """
@@ -114,7 +653,7 @@ class FileHandler:
         column_mapping = {}
         df_columns_lower = {col.lower(): col for col in df.columns}
         
-        for required_col in FileHandler.REQUIRED_COLUMNS:
+        for required_col in FileHandler.REQUIRED_COLUMNS + FileHandler.OPTIONAL_COLUMNS + FileHandler.EXTRA_COLUMNS:
             if required_col.lower() in df_columns_lower:
                 original_col = df_columns_lower[required_col.lower()]
                 column_mapping[original_col] = required_col
@@ -122,8 +661,55 @@ class FileHandler:
         # 重新命名欄位
         df_standardized = df.rename(columns=column_mapping)
         
-        # 只保留必要欄位
-        return df_standardized[FileHandler.REQUIRED_COLUMNS]
+        # 只保留必要欄位（與有提供的選用欄位、已翻譯的英文名稱）
+        optional_columns = [col for col in FileHandler.OPTIONAL_COLUMNS + FileHandler.EXTRA_COLUMNS
+                            if col in df_standardized.columns]
+        return df_standardized[FileHandler.REQUIRED_COLUMNS + optional_columns]
+    
+    @staticmethod
+    def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        精簡欄位型別以減少記憶體用量
+        
+        重複值多的國家與類別欄位轉為類別型別，字串欄位改用 Arrow 字串，
+        價格在不損失精度時降為較小的數值型別。原本的記憶體用量記錄在 attrs['original_memory_bytes']。
+        
+        Args:
+            df: 標準化後的 DataFrame
+            
+        Returns:
+            pd.DataFrame: 精簡型別後的 DataFrame
+        """
+        if df is None:
+            return None
+        
+        original_bytes = int(df.memory_usage(deep=True).sum())
+        columns = {}
+        for col in df.columns:
+            series = df[col]
+            if col in FileHandler.CATEGORICAL_COLUMNS and not isinstance(series.dtype, pd.CategoricalDtype):
+                if series.nunique(dropna=True) <= len(series) // 2:
+                    columns[col] = series.astype('category')
+                    continue
+            
+            if col == 'price':
+                if pd.api.types.is_integer_dtype(series):
+                    columns[col] = pd.to_numeric(series, downcast='integer')
+                elif pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+                    downcast = series.astype(np.float32)
+                    # 只有每個價格都能以 float32 精確表示時才降級，避免比對結果出現 12.34000015 之類的數值
+                    if downcast.astype(series.dtype).equals(series):
+                        columns[col] = downcast
+            
+            elif ARROW_STRING_DTYPE is not None and series.dtype == object and \
+                    pd.api.types.infer_dtype(series, skipna=True) == 'string':
+                columns[col] = series.astype(ARROW_STRING_DTYPE)
+        
+        compacted = df.assign(**columns) if columns else df
+        compacted.attrs['original_memory_bytes'] = original_bytes
+        saved = original_bytes - int(compacted.memory_usage(deep=True).sum())
+        logger.info("精簡欄位型別節省 %.1f MB 記憶體", saved / 1024 / 1024)
+        return compacted
     
     @staticmethod
     def get_data_preview(df: pd.DataFrame, num_rows: int = 10) -> pd.DataFrame:
@@ -143,33 +729,102 @@ class FileHandler:
         return df.head(num_rows)
     
     @staticmethod
-    def get_data_info(df: pd.DataFrame) -> Dict[str, Any]:
+    def profile_data(df: pd.DataFrame) -> Dict[str, Any]:
         """
-        獲取資料基本資訊
+        一次計算資料預覽所需的所有統計資訊
         
         Args:
             df: 要分析的 DataFrame
             
         Returns:
-            Dict: 包含資料統計資訊的字典
+            Dict: 筆數、欄位、缺失值、型別、國家數、價格統計、重複 ID、記憶體用量與資料品質問題
         """
-        if df is None:
-            return {}
+        missing_values = df.isna().sum().to_dict()
+        memory_bytes = int(df.memory_usage(deep=True).sum())
+        
+        prices = None
+        if 'price' in df.columns:
+            prices = pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        has_prices = prices is not None and not np.isnan(prices).all()
         
-        info = {
+        profile = {
             'total_rows': len(df),
             'total_columns': len(df.columns),
-            'missing_values': df.isnull().sum().to_dict(),
+            'columns': list(df.columns),
+            'missing_values': missing_values,
             'data_types': df.dtypes.to_dict(),
             'unique_countries': df['product_location_country'].nunique() if 'product_location_country' in df.columns else 0,
             'price_range': {
-                'min': df['price'].min() if 'price' in df.columns else None,
-                'max': df['price'].max() if 'price' in df.columns else None,
-                'mean': df['price'].mean() if 'price' in df.columns else None
-            }
+                'min': float(np.nanmin(prices)) if has_prices else None,
+                'max': float(np.nanmax(prices)) if has_prices else None,
+                'mean': float(np.nanmean(prices)) if has_prices else None
+            },
+            'duplicate_ids': int(df['product_id'].duplicated().sum()) if 'product_id' in df.columns else 0,
+            'negative_prices': int((prices < 0).sum()) if prices is not None else 0,
+            'memory_bytes': memory_bytes,
+            # 精簡欄位型別節省的記憶體（未經 compact_dtypes 處理時為 0）
+            'memory_saved_bytes': max(0, df.attrs.get('original_memory_bytes', memory_bytes) - memory_bytes)
         }
         
-        return info
+        issues = []
+        if len(df) == 0:
+            issues.append("資料框為空")
+        else:
+            missing_columns = [col for col in FileHandler.REQUIRED_COLUMNS if col not in df.columns]
+            if missing_columns:
+                issues.append(f"缺少必要欄位: {', '.join(missing_columns)}")
+            if profile['duplicate_ids'] > 0:
+                issues.append(f"發現 {profile['duplicate_ids']} 個重複的產品ID")
+            if missing_values.get('product_name', 0) > 0:
+                issues.append(f"發現 {missing_values['product_name']} 個空的產品名稱")
+            if profile['negative_prices'] > 0:
+                issues.append(f"發現 {profile['negative_prices']} 個負價格")
+        profile['quality_issues'] = issues
+        
+        return profile
+    
+    @staticmethod
+    def get_profile(df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        取得資料概況：依資料集雜湊查詢快取，沒有時計算一次並快取
+        
+        上傳的檔案在讀檔時已計算概況；其他 DataFrame 以內容雜湊為鍵。
+        
+        Args:
+            df: 要分析的 DataFrame
+            
+        Returns:
+            Dict: 資料概況（見 profile_data）
+        """
+        key = df.attrs.get('dataset_hash')
+        if key is not None:
+            profile = FileHandler.profile_cache.get(key)
+            # 衍生的 DataFrame 會沿用 attrs，筆數或欄位不同時不可共用概況
+            if profile is not None and profile['total_rows'] == len(df) and profile['columns'] == list(df.columns):
+                return profile
+        
+        key = FileHandler.result_fingerprint(df)
+        profile = FileHandler.profile_cache.get(key)
+        if profile is None:
+            profile = FileHandler.profile_data(df)
+            FileHandler.profile_cache.put(key, profile)
+        return profile
+    
+    @staticmethod
+    def get_data_info(df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        獲取資料基本資訊（取自快取的資料概況）
+        
+        Args:
+            df: 要分析的 DataFrame
+            
+        Returns:
+            Dict: 包含資料統計資訊的字典
+        """
+        if df is None:
+            return {}
+        
+        return FileHandler.get_profile(df)
     
     @staticmethod
     def export_to_csv(df: pd.DataFrame, filename: str = "比對結果.csv") -> bytes:
@@ -183,9 +838,43 @@ class FileHandler:
         Returns:
             bytes: CSV 檔案的二進位資料
         """
-        output = io.StringIO()
+        output = io.BytesIO()
         df.to_csv(output, index=False, encoding='utf-8-sig')
-        return output.getvalue().encode('utf-8-sig')
+        return output.getvalue()
+    
+    @staticmethod
+    def export_to_csv_gzip(df: pd.DataFrame, filename: str = "比對結果.csv.gz") -> bytes:
+        """
+        匯出 DataFrame 為 gzip 壓縮的 CSV，分段寫入壓縮串流，不先產生完整的未壓縮 CSV
+        
+        Args:
+            df: 要匯出的 DataFrame
+            filename: 檔案名稱
+            
+        Returns:
+            bytes: 壓縮檔的二進位資料
+        """
+        output = io.BytesIO()
+        df.to_csv(output, index=False, encoding='utf-8-sig', compression={'method': 'gzip'})
+        return output.getvalue()
+    
+    @staticmethod
+    def export_to_csv_zip(df: pd.DataFrame, filename: str = "比對結果.zip") -> bytes:
+        """
+        匯出 DataFrame 為 zip 壓縮的 CSV，分段寫入壓縮串流，不先產生完整的未壓縮 CSV
+        
+        Args:
+            df: 要匯出的 DataFrame
+            filename: 檔案名稱（壓縮檔內的 CSV 檔名取相同主檔名）
+            
+        Returns:
+            bytes: 壓縮檔的二進位資料
+        """
+        output = io.BytesIO()
+        archive_name = os.path.splitext(os.path.basename(filename))[0] + '.csv'
+        df.to_csv(output, index=False, encoding='utf-8-sig',
+                  compression={'method': 'zip', 'archive_name': archive_name})
+        return output.getvalue()
     
     @staticmethod
     def export_to_excel(df: pd.DataFrame, filename: str = "比對結果.xlsx") -> bytes:
@@ -203,3 +892,78 @@ class FileHandler:
         with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
             df.to_excel(writer, sheet_name='比對結果', index=False)
         return output.getvalue()
+    
+    @staticmethod
+    def export_to_parquet(df: pd.DataFrame, filename: str = "比對結果.parquet") -> bytes:
+        """
+        匯出 DataFrame 為 Parquet 格式
+        
+        Args:
+            df: 要匯出的 DataFrame
+            filename: 檔案名稱
+            
+        Returns:
+            bytes: Parquet 檔案的二進位資料
+        """
+        output = io.BytesIO()
+        df.to_parquet(output, index=False, engine='pyarrow')
+        return output.getvalue()
+    
+    @staticmethod
+    def export_to_feather(df: pd.DataFrame, filename: str = "比對結果.feather") -> bytes:
+        """
+        匯出 DataFrame 為 Arrow IPC（Feather）格式
+        
+        Args:
+            df: 要匯出的 DataFrame
+            filename: 檔案名稱
+            
+        Returns:
+            bytes: Feather 檔案的二進位資料
+        """
+        output = io.BytesIO()
+        df.reset_index(drop=True).to_feather(output)
+        return output.getvalue()
+    
+    @staticmethod
+    def result_fingerprint(df: pd.DataFrame) -> str:
+        """
+        計算結果內容的雜湊值（欄位名稱與所有儲存格）
+        
+        Args:
+            df: 結果 DataFrame
+            
+        Returns:
+            str: 雜湊值
+        """
+        digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        digest.update(repr(list(df.columns)).encode('utf-8'))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def lazy_export(df: pd.DataFrame, file_format: str) -> Callable[[], bytes]:
+        """
+        建立延遲產生匯出檔案的函式：呼叫時才產生，同一份結果與格式只產生一次
+        
+        可直接傳給 st.download_button 的 data，使用者按下下載時才會執行。
+        
+        Args:
+            df: 要匯出的 DataFrame
+            file_format: 匯出格式，EXPORT_FORMATS 的鍵值
+            
+        Returns:
+            Callable[[], bytes]: 返回匯出檔案二進位資料的函式
+        """
+        if file_format not in FileHandler.EXPORT_FORMATS:
+            raise ValueError(f"不支援的匯出格式: {file_format}，可用格式: {', '.join(FileHandler.EXPORT_FORMATS)}")
+        exporter = getattr(FileHandler, FileHandler.EXPORT_FORMATS[file_format])
+        
+        def build() -> bytes:
+            key = f"{FileHandler.result_fingerprint(df)}:{file_format}"
+            data = FileHandler.export_cache.get(key)
+            if data is None:
+                data = exporter(df)
+                FileHandler.export_cache.put(key, data)
+            return data
+        
+        return build
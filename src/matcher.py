@@ -5,26 +5,300 @@
 實現 Jaccard 相似度算法來比對產品
 """
 
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+import numpy as np
 import pandas as pd
-import streamlit as st
-from typing import Dict, List, Set, Any, Tuple
+from scipy import sparse
+from typing import Dict, List, Set, Any, Tuple, Optional, Iterable
 from multiprocessing import Pool, cpu_count
-import itertools
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+try:
+    from .progress import ProgressCallback, ThrottledProgress, resolve_progress_callback
+except ImportError:
+    from progress import ProgressCallback, ThrottledProgress, resolve_progress_callback
+
+
+logger = logging.getLogger(__name__)
+
+
+def _match_shard(task: Tuple) -> Tuple[int, np.ndarray, np.ndarray]:
+    """
+    比對單一分片（供 multiprocessing 工作行程呼叫）
+    
+    Args:
+        task: (分片編號, 比對器設定, 比對引擎, 供應商A詞彙目錄, 供應商B詞彙目錄)
+        
+    Returns:
+        Tuple: (分片編號, 最佳比對的B位置, 最佳相似度)
+    """
+    shard_id, settings, engine, block_a, block_b = task
+    matcher = ProductMatcher(**settings)
+    best_cols, best_scores = matcher._best_matches_block(block_a, block_b, engine)
+    return shard_id, best_cols, best_scores
+
+
+class TokenizedCatalog:
+    """斷詞並內部化後的產品目錄，詞彙以整數編號儲存在連續陣列中"""
+    
+    def __init__(self, token_ids: np.ndarray, offsets: np.ndarray):
+        """
+        初始化詞彙目錄
+        
+        Args:
+            token_ids: 所有產品的詞彙編號（每個產品內由小到大排序）
+            offsets: 每個產品在 token_ids 中的起始位置，長度為產品數 + 1
+        """
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.counts = np.diff(offsets).astype(np.int32)
+    
+    @classmethod
+    def from_texts(cls, texts: Iterable, vocabulary: Dict[str, int], tokenize) -> 'TokenizedCatalog':
+        """
+        將產品名稱斷詞一次並內部化為整數編號
+        
+        Args:
+            texts: 產品名稱
+            vocabulary: 詞彙 → 編號對應表（兩個供應商共用，會補上新詞彙）
+            tokenize: 斷詞函數
+            
+        Returns:
+            TokenizedCatalog: 詞彙目錄
+        """
+        interned: Dict[Any, List[int]] = {}
+        token_ids: List[int] = []
+        offsets = [0]
+        
+        for text in texts:
+            key = text if isinstance(text, str) else None
+            ids = interned.get(key)
+            if ids is None:
+                ids = sorted(vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text))
+                interned[key] = ids
+            token_ids.extend(ids)
+            offsets.append(len(token_ids))
+        
+        return cls(np.array(token_ids, dtype=np.int32), np.array(offsets, dtype=np.int64))
+    
+    def __len__(self) -> int:
+        return len(self.counts)
+    
+    def tokens(self, position: int) -> np.ndarray:
+        """
+        取得單一產品的詞彙編號
+        
+        Args:
+            position: 產品位置
+            
+        Returns:
+            np.ndarray: 詞彙編號陣列
+        """
+        return self.token_ids[self.offsets[position]:self.offsets[position + 1]]
+    
+    def subset(self, positions: np.ndarray) -> 'TokenizedCatalog':
+        """
+        取出部分產品組成新的詞彙目錄
+        
+        Args:
+            positions: 產品位置
+            
+        Returns:
+            TokenizedCatalog: 只包含指定產品的詞彙目錄
+        """
+        counts = self.counts[positions].astype(np.int64)
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        gather = np.repeat(self.offsets[positions] - offsets[:-1], counts) + np.arange(offsets[-1])
+        return TokenizedCatalog(self.token_ids[gather], offsets)
+    
+    def postings(self) -> Dict[int, np.ndarray]:
+        """
+        建立倒排表（詞彙編號 → 產品位置，位置由小到大）
+        
+        Returns:
+            Dict[int, np.ndarray]: 倒排表
+        """
+        owners = np.repeat(np.arange(len(self), dtype=np.int64), self.counts)
+        order = np.argsort(self.token_ids, kind='stable')
+        sorted_ids = self.token_ids[order]
+        sorted_owners = owners[order]
+        boundaries = np.flatnonzero(np.diff(sorted_ids)) + 1
+        first_ids = sorted_ids[np.concatenate(([0], boundaries))] if len(sorted_ids) else []
+        return dict(zip(np.asarray(first_ids).tolist(), np.split(sorted_owners, boundaries)))
+    
+    def to_csr(self, num_columns: int) -> sparse.csr_matrix:
+        """
+        轉換為稀疏二元矩陣（每列一個產品、每欄一個詞彙）
+        
+        Args:
+            num_columns: 欄位數（詞彙數）
+            
+        Returns:
+            sparse.csr_matrix: 稀疏二元矩陣
+        """
+        data = np.ones(len(self.token_ids), dtype=np.int32)
+        return sparse.csr_matrix((data, self.token_ids, self.offsets), shape=(len(self), num_columns))
+
+
+class InvertedIndex:
+    """供應商 B 的倒排索引（詞彙編號 → 產品位置），依比對區塊（國家等分區鍵）分區"""
+    
+    def __init__(self, df_b: pd.DataFrame, catalog: TokenizedCatalog, vocabulary: Dict[str, int],
+                 blocks: Dict[Tuple, np.ndarray], blocking_keys: List[str] = None):
+        """
+        建立倒排索引
+        
+        Args:
+            df_b: 供應商B的產品資料
+            catalog: 供應商B的詞彙目錄
+            vocabulary: 詞彙 → 編號對應表
+            blocks: 區塊鍵值 → 供應商B產品位置
+            blocking_keys: 建立區塊時使用的額外分區鍵
+        """
+        self.records = df_b.to_dict('records')
+        self.catalog = catalog
+        self.vocabulary = vocabulary
+        self.blocking_keys = blocking_keys or []
+        self.postings: Dict[Tuple, Dict[int, np.ndarray]] = {}
+        
+        for block_key, positions in blocks.items():
+            local_postings = catalog.subset(positions).postings()
+            self.postings[block_key] = {
+                token_id: positions[local] for token_id, local in local_postings.items()
+            }
+    
+    def block_postings(self, block_key: Optional[Tuple]) -> Dict[int, np.ndarray]:
+        """
+        取得指定區塊的倒排表
+        
+        Args:
+            block_key: 區塊鍵值（國家在前），None 表示不參與比對
+            
+        Returns:
+            Dict[int, np.ndarray]: 詞彙編號 → 產品位置
+        """
+        if block_key is None:
+            return {}
+        return self.postings.get(block_key, {})
+    
+    def lookup(self, tokens: Set[str]) -> np.ndarray:
+        """
+        將詞彙集合轉換為詞彙編號（略過供應商B沒有的詞彙）
+        
+        Args:
+            tokens: 詞彙集合
+            
+        Returns:
+            np.ndarray: 詞彙編號陣列
+        """
+        return np.array([self.vocabulary[token] for token in tokens if token in self.vocabulary], dtype=np.int32)
 
 
 class ProductMatcher:
     """產品比對器類別"""
     
-    def __init__(self, similarity_threshold: float = 0.2, max_token_diff: int = 5):
+    ENGINES = ['index', 'sparse', 'prefix', 'minhash']
+    
+    # 以門檻值剪枝候選的引擎：門檻越低越慢，保留候選比對時不降低門檻
+    THRESHOLD_PRUNED_ENGINES = ['prefix']
+    
+    # 斷詞方式：'words' 以空白切分英文名稱，'cjk_ngram' 直接以中文名稱的字元 n-gram 斷詞（不需翻譯）
+    TOKENIZERS = ['words', 'cjk_ngram']
+    
+    # 中日韓文字區段與英數字詞彙，供字元 n-gram 斷詞使用
+    _CJK_RUN = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff]+|[a-z0-9]+')
+    
+    # 浮點誤差容許值，讓過濾條件偏向保守（寧可多驗證，不可漏掉）
+    _EPSILON = 1e-9
+    
+    # 以價格帶分區時使用的分區鍵名稱
+    PRICE_BAND_KEY = 'price_band'
+    
+    # MinHash 雜湊使用的梅森質數 (2^31 - 1)，讓乘法結果維持在 uint64 範圍內
+    _MINHASH_PRIME = (1 << 31) - 1
+    
+    def __init__(self, similarity_threshold: float = 0.2, max_token_diff: int = 5,
+                 engine: str = 'index', sparse_chunk_size: int = 2000, n_jobs: int = 1,
+                 sparse_max_nnz: int = 1_000_000, lsh_bands: int = 32, lsh_rows: int = 4, lsh_seed: int = 42,
+                 recall_sample_size: int = 200, blocking_keys: List[str] = None,
+                 price_band_width: float = 100.0, top_k: int = None, tokenizer: str = 'words',
+                 ngram_sizes: Tuple[int, ...] = (2,)):
         """
         初始化比對器
         
         Args:
             similarity_threshold: 相似度門檻 (0.0-1.0)
             max_token_diff: 最大詞彙數量差異
+            engine: 比對引擎，'index' 為倒排索引逐筆比對，'sparse' 為稀疏矩陣批次比對，
+                    'prefix' 為以門檻值進行長度/前綴/位置過濾的精確比對，
+                    'minhash' 為 MinHash + LSH 近似比對（適合極大量資料）
+            sparse_chunk_size: 每個比對分片的供應商A產品數上限（進度回報與平行分工的單位）
+            n_jobs: 平行比對的行程數，1 表示不平行，-1 表示使用所有 CPU
+            sparse_max_nnz: 稀疏矩陣引擎每批交集矩陣的非零元素數上限（依詞彙出現次數預估），
+                            限制記憶體用量；名稱共用常見詞彙時交集矩陣接近稠密，批次會自動縮小
+            lsh_bands: MinHash LSH 的分段數（越多召回率越高、速度越慢）
+            lsh_rows: MinHash LSH 每段的列數（越多候選越少、召回率越低）
+            lsh_seed: MinHash 雜湊與召回率抽樣的亂數種子
+            recall_sample_size: 近似比對時用來估算召回率的抽樣數
+            blocking_keys: 國家以外的額外分區鍵，例如 'price_band'（價格帶）或 'category'，
+                           只有同一區塊的產品才會比對；兩邊資料缺少的分區鍵會略過
+            price_band_width: 價格帶寬度（使用 'price_band' 分區鍵時）
+            top_k: 每個供應商A產品保留的前 K 名比對（可選，未指定時只保留最佳比對且不加名次欄位）
+            tokenizer: 斷詞方式，'words' 為英文名稱（product_name_en）以空白斷詞，
+                       'cjk_ngram' 為中文名稱（product_name）的字元 n-gram 加上英數字詞彙，不需翻譯
+            ngram_sizes: 'cjk_ngram' 斷詞使用的字元 n-gram 長度，例如 (2,) 為二元組、(2, 3) 為二元組加三元組
         """
+        if engine not in self.ENGINES:
+            raise ValueError(f"不支援的比對引擎: {engine}，可用引擎: {', '.join(self.ENGINES)}")
+        if tokenizer not in self.TOKENIZERS:
+            raise ValueError(f"不支援的斷詞方式: {tokenizer}，可用方式: {', '.join(self.TOKENIZERS)}")
+        
         self.similarity_threshold = similarity_threshold
         self.max_token_diff = max_token_diff
+        self.engine = engine
+        self.sparse_chunk_size = sparse_chunk_size
+        self.n_jobs = n_jobs
+        self.sparse_max_nnz = sparse_max_nnz
+        self.lsh_bands = lsh_bands
+        self.lsh_rows = lsh_rows
+        self.lsh_seed = lsh_seed
+        self.recall_sample_size = recall_sample_size
+        self.blocking_keys = list(blocking_keys or [])
+        self.price_band_width = price_band_width
+        self.top_k = top_k
+        self.tokenizer = tokenizer
+        self.ngram_sizes = tuple(ngram_sizes)
+        
+        # 最近一次比對的執行統計（例如近似比對的召回率）
+        self.last_run_stats: Dict[str, Any] = {}
+        
+        # 最近一次以 keep_candidates 比對保留的候選比對，以及產生候選時使用的門檻
+        self.candidates: Optional[pd.DataFrame] = None
+        self.candidates_threshold: Optional[float] = None
+    
+    @staticmethod
+    def _resolve_n_jobs(n_jobs: Optional[int]) -> int:
+        """
+        將平行行程數設定轉換為實際行程數
+        
+        Args:
+            n_jobs: 平行行程數設定，小於等於 0 表示依 CPU 數量推算（-1 為全部）
+            
+        Returns:
+            int: 實際使用的行程數
+        """
+        if not n_jobs:
+            return 1
+        if n_jobs < 0:
+            return max(1, cpu_count() + 1 + n_jobs)
+        return n_jobs
     
     @staticmethod
     def tokenize(text: str) -> Set[str]:
@@ -41,6 +315,44 @@ class ProductMatcher:
             return set()
         return set(text.lower().split())
     
+    @classmethod
+    def tokenize_cjk_ngrams(cls, text: str, ngram_sizes: Tuple[int, ...] = (2, 3)) -> Set[str]:
+        """
+        將中文文字斷詞為字元 n-gram，夾雜的英數字以完整詞彙保留
+        
+        Args:
+            text: 要斷詞的文字
+            ngram_sizes: 字元 n-gram 長度
+            
+        Returns:
+            Set[str]: 斷詞後的詞彙集合（短於最小 n-gram 的中文片段以整段保留）
+        """
+        if not isinstance(text, str):
+            return set()
+        
+        tokens = set()
+        for run in cls._CJK_RUN.findall(unicodedata.normalize('NFKC', text).lower()):
+            if run.isascii():
+                tokens.add(run)
+                continue
+            if len(run) < min(ngram_sizes):
+                tokens.add(run)
+                continue
+            for size in ngram_sizes:
+                tokens.update(run[i:i + size] for i in range(len(run) - size + 1))
+        return tokens
+    
+    def _tokenize(self, text: str) -> Set[str]:
+        """依設定的斷詞方式斷詞"""
+        if self.tokenizer == 'cjk_ngram':
+            return self.tokenize_cjk_ngrams(text, self.ngram_sizes)
+        return self.tokenize(text)
+    
+    @property
+    def name_column(self) -> str:
+        """斷詞使用的產品名稱欄位（字元 n-gram 斷詞直接使用原始名稱）"""
+        return 'product_name' if self.tokenizer == 'cjk_ngram' else 'product_name_en'
+    
     @staticmethod
     def calculate_jaccard_similarity(set1: Set[str], set2: Set[str]) -> float:
         """
@@ -57,66 +369,1151 @@ class ProductMatcher:
         union = set1 | set2
         return len(intersection) / len(union) if union else 0
     
-    def compare_single_product(self, row_a: Dict[str, Any], df_b: pd.DataFrame) -> List[Dict[str, Any]]:
+    def prepare_catalogs(self, df_a: pd.DataFrame, df_b: pd.DataFrame) -> Tuple[TokenizedCatalog, TokenizedCatalog, Dict[str, int]]:
+        """
+        前處理：兩個供應商的產品名稱各斷詞一次，並以共用的詞彙表內部化
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            
+        Returns:
+            Tuple: (供應商A詞彙目錄, 供應商B詞彙目錄, 詞彙 → 編號對應表)
+        """
+        vocabulary: Dict[str, int] = {}
+        catalog_b = TokenizedCatalog.from_texts(self._names(df_b), vocabulary, self._tokenize)
+        catalog_a = TokenizedCatalog.from_texts(self._names(df_a), vocabulary, self._tokenize)
+        return catalog_a, catalog_b, vocabulary
+    
+    def _names(self, df: pd.DataFrame) -> List[Any]:
+        """取得要斷詞的產品名稱欄位"""
+        if self.name_column not in df.columns:
+            return [''] * len(df)
+        return df[self.name_column].tolist()
+    
+    def _active_blocking_keys(self, columns_a: Iterable[str], columns_b: Iterable[str]) -> List[str]:
+        """
+        取得兩邊資料都具備的額外分區鍵（缺少的分區鍵會略過並記錄警告）
+        
+        Args:
+            columns_a: 供應商A的欄位
+            columns_b: 供應商B的欄位
+            
+        Returns:
+            List[str]: 可使用的額外分區鍵
+        """
+        columns = set(columns_a) & set(columns_b)
+        active = []
+        for key in self.blocking_keys:
+            required = 'price' if key == self.PRICE_BAND_KEY else key
+            if required in columns:
+                active.append(key)
+            else:
+                logger.warning("分區鍵 %s 所需欄位 %s 不存在於兩個供應商的資料中，已略過", key, required)
+        return active
+    
+    def _price_band(self, price: Any) -> float:
+        """將價格轉換為價格帶編號（缺少價格時為 -1）"""
+        price = pd.to_numeric(price, errors='coerce')
+        return -1.0 if pd.isna(price) else float(np.floor(price / self.price_band_width))
+    
+    def _row_block_key(self, row: Dict[str, Any], blocking_keys: List[str]) -> Optional[Tuple]:
+        """
+        計算單一產品的區塊鍵值
+        
+        Args:
+            row: 產品資料
+            blocking_keys: 額外分區鍵
+            
+        Returns:
+            Tuple or None: 區塊鍵值，國家為空值時為 None（不參與比對）
+        """
+        country = row.get('product_location_country', '')
+        if pd.isna(country):
+            return None
+        
+        values = [country]
+        for key in blocking_keys:
+            if key == self.PRICE_BAND_KEY:
+                values.append(self._price_band(row.get('price')))
+            else:
+                value = row.get(key)
+                values.append('' if pd.isna(value) else value)
+        return tuple(values)
+    
+    def _group_positions(self, df: pd.DataFrame, blocking_keys: List[str]) -> Dict[Tuple, np.ndarray]:
+        """
+        將產品依區塊鍵值分組，只掃描一次資料
+        
+        Args:
+            df: 產品資料
+            blocking_keys: 額外分區鍵
+            
+        Returns:
+            Dict[Tuple, np.ndarray]: 區塊鍵值 → 產品位置
+        """
+        key_columns = {'product_location_country': df['product_location_country']}
+        for key in blocking_keys:
+            if key == self.PRICE_BAND_KEY:
+                prices = pd.to_numeric(df['price'], errors='coerce')
+                key_columns[key] = np.floor(prices / self.price_band_width).fillna(-1.0)
+            else:
+                # 額外分區鍵的空值自成一組；國家為空值的產品不參與比對
+                key_columns[key] = df[key].astype(object).fillna('')
+        
+        grouped = pd.DataFrame(key_columns, index=df.index).groupby(
+            list(key_columns), sort=False, observed=True
+        ).indices
+        return {
+            (block_key if isinstance(block_key, tuple) else (block_key,)): positions
+            for block_key, positions in grouped.items()
+        }
+    
+    def build_blocks(self, df_a: pd.DataFrame, df_b: pd.DataFrame) -> Dict[Tuple, Tuple[np.ndarray, np.ndarray]]:
+        """
+        區塊化：依國家（與額外分區鍵）將兩個供應商各分組一次
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            
+        Returns:
+            Dict: 區塊鍵值 → (供應商A產品位置, 供應商B產品位置)，只包含兩邊都有產品的區塊
+        """
+        blocking_keys = self._active_blocking_keys(df_a.columns, df_b.columns)
+        blocks_a = self._group_positions(df_a, blocking_keys)
+        blocks_b = self._group_positions(df_b, blocking_keys)
+        return {
+            block_key: (positions_a, blocks_b[block_key])
+            for block_key, positions_a in blocks_a.items() if block_key in blocks_b
+        }
+    
+    def build_index(self, df_b: pd.DataFrame, catalog_b: TokenizedCatalog = None,
+                    vocabulary: Dict[str, int] = None, blocking_keys: List[str] = None) -> InvertedIndex:
+        """
+        建立供應商 B 的倒排索引
+        
+        Args:
+            df_b: 供應商B的所有產品資料
+            catalog_b: 供應商B的詞彙目錄（可選，未提供時自動斷詞）
+            vocabulary: 與詞彙目錄對應的詞彙表
+            blocking_keys: 額外分區鍵（可選，預設為供應商B具備的分區鍵）
+            
+        Returns:
+            InvertedIndex: 依區塊分區的倒排索引
+        """
+        if catalog_b is None:
+            vocabulary = {}
+            catalog_b = TokenizedCatalog.from_texts(self._names(df_b), vocabulary, self._tokenize)
+        if blocking_keys is None:
+            blocking_keys = self._active_blocking_keys(df_b.columns, df_b.columns)
+        blocks = self._group_positions(df_b, blocking_keys)
+        return InvertedIndex(df_b, catalog_b, vocabulary, blocks, blocking_keys)
+    
+    def _top_candidates(self, postings: Dict[int, np.ndarray], counts_b: np.ndarray,
+                        token_ids: np.ndarray, count_a: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        以倒排表累計交集數，找出單一產品的前 K 名比對
+        
+        Args:
+            postings: 詞彙編號 → 供應商B產品位置
+            counts_b: 供應商B每個產品的詞彙數
+            token_ids: 供應商A產品的詞彙編號
+            count_a: 供應商A產品的詞彙數
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (依相似度由高到低排列的B位置, 對應相似度)，最多 K 筆
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        lists = [postings[token_id] for token_id in token_ids.tolist() if token_id in postings]
+        if not lists:
+            return empty
+        
+        # 沒有共同詞彙的產品相似度為 0，不可能成為最佳比對
+        candidates, intersections = np.unique(np.concatenate(lists), return_counts=True)
+        
+        # 如果詞彙數量差異太大，跳過比較
+        counts = counts_b[candidates]
+        keep = np.abs(counts - count_a) <= self.max_token_diff
+        if not keep.any():
+            return empty
+        candidates, intersections, counts = candidates[keep], intersections[keep], counts[keep]
+        
+        # 候選位置由小到大，argmax 取第一個最大值，與逐筆掃描的同分處理一致
+        scores = intersections / (count_a + counts - intersections)
+        if self._k == 1:
+            best = np.argmax(scores)
+            return candidates[best:best + 1], scores[best:best + 1]
+        
+        # 依 (相似度由高到低, 位置由小到大) 取前 K 名
+        order = np.lexsort((candidates, -scores))[:self._k]
+        return candidates[order], scores[order]
+    
+    @property
+    def _k(self) -> int:
+        """每個供應商A產品保留的比對數"""
+        return max(1, self.top_k or 1)
+    
+    def compare_single_product(self, row_a: Dict[str, Any], df_b: pd.DataFrame,
+                               index: Optional[InvertedIndex] = None) -> List[Dict[str, Any]]:
         """
         比對單一產品與供應商 B 的所有相關產品
         
         Args:
             row_a: 供應商A的產品資料
             df_b: 供應商B的所有產品資料
+            index: 供應商B的倒排索引（可選，未提供時只針對相同國家的產品建立）
+            
+        Returns:
+            List[Dict]: 比對結果列表
+        """
+        tokens_a = self._tokenize(row_a.get(self.name_column, ''))
+        
+        if index is None:
+            # 只比對相同國家的產品
+            country = row_a.get('product_location_country', '')
+            blocking_keys = self._active_blocking_keys(row_a.keys(), df_b.columns)
+            index = self.build_index(df_b[df_b['product_location_country'] == country],
+                                     blocking_keys=blocking_keys)
+        
+        block_key = self._row_block_key(row_a, index.blocking_keys)
+        return self._match_row(row_a, index.lookup(tokens_a), len(tokens_a), index, block_key)
+    
+    def _match_row(self, row_a: Dict[str, Any], token_ids: np.ndarray, count_a: int,
+                   index: InvertedIndex, block_key: Optional[Tuple]) -> List[Dict[str, Any]]:
+        """
+        以倒排索引比對單一產品
+        
+        Args:
+            row_a: 供應商A的產品資料
+            token_ids: 供應商A產品的詞彙編號
+            count_a: 供應商A產品的詞彙數
+            index: 供應商B的倒排索引
+            block_key: 供應商A產品所屬的區塊鍵值
             
         Returns:
             List[Dict]: 比對結果列表
         """
         results = []
-        tokens_a = self.tokenize(row_a.get('product_name_en', ''))
-        country = row_a.get('product_location_country', '')
+        positions, scores = self._top_candidates(
+            index.block_postings(block_key), index.catalog.counts, token_ids, count_a
+        )
+        
+        # 只保留相似度 >= 門檻值的結果
+        for rank, (position, score) in enumerate(zip(positions.tolist(), scores.tolist()), start=1):
+            if score >= self.similarity_threshold:
+                results.append(self._build_result(row_a, index.records[position], score, self._rank(rank)))
+        
+        return results
+    
+    def _rank(self, rank: int) -> Optional[int]:
+        """只有指定 top_k 時才在結果中加入名次"""
+        return rank if self.top_k else None
+    
+    @staticmethod
+    def _build_result(row_a: Dict[str, Any], row_b: Dict[str, Any], score: float,
+                      rank: Optional[int] = None) -> Dict[str, Any]:
+        """
+        組合單筆比對結果
+        
+        Args:
+            row_a: 供應商A的產品資料
+            row_b: 供應商B的產品資料
+            score: Jaccard 相似度
+            rank: 名次（可選，保留前 K 名時使用）
+            
+        Returns:
+            Dict: 比對結果
+        """
+        vendor_a_price = row_a.get('price', 0) or 0
+        vendor_b_price = row_b.get('price', 0) or 0
+        price_diff = vendor_b_price - vendor_a_price
+        
+        result = {
+            'product_location_country': row_a.get('product_location_country', ''),
+            'vendor_A_product_id': row_a.get('product_id', ''),
+            'vendor_A_product_name': row_a.get('product_name', ''),
+            'vendor_A_product_name_en': row_a.get('product_name_en', ''),
+            'vendor_A_price': vendor_a_price,
+            'vendor_B_product_id': row_b.get('product_id', ''),
+            'vendor_B_product_name': row_b.get('product_name', ''),
+            'vendor_B_product_name_en': row_b.get('product_name_en', ''),
+            'vendor_B_price': vendor_b_price,
+            'jaccard_score': score,
+            'price_diff': price_diff
+        }
+        if rank is not None:
+            result['rank'] = rank
+        return result
+    
+    def _best_matches_sparse(self, block_a: TokenizedCatalog, block_b: TokenizedCatalog) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        以稀疏矩陣運算找出每個供應商A產品的最佳比對
+        
+        交集數由矩陣乘積取得，聯集數由兩邊詞彙數相加再扣除交集數。
+        供應商A依預估的交集非零元素數分批相乘，每批不超過 sparse_max_nnz。
+        
+        Args:
+            block_a: 同一國家區塊內供應商A產品的詞彙目錄
+            block_b: 同一國家區塊內供應商B產品的詞彙目錄
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (前 K 名的B位置，形狀為 (產品數, K)，無比對為 -1；對應相似度)
+        """
+        num_columns = int(max(block_a.token_ids.max(initial=-1), block_b.token_ids.max(initial=-1))) + 1
+        matrix_a = block_a.to_csr(num_columns)
+        matrix_b_t = block_b.to_csr(num_columns).T.tocsr()
+        
+        sizes_a = block_a.counts
+        sizes_b = block_b.counts
+        
+        best_cols = np.full((len(block_a), self._k), -1, dtype=np.int64)
+        best_scores = np.zeros((len(block_a), self._k), dtype=np.float64)
+        for start, stop in self._nnz_chunks(self._estimate_row_nnz(block_a, block_b, num_columns),
+                                            self.sparse_max_nnz):
+            intersections = (matrix_a[start:stop] @ matrix_b_t).tocoo()
+            rows, cols = intersections.row, intersections.col
+            inter = intersections.data.astype(np.float64)
+            
+            # 詞彙數量差異太大的組合不列入比較
+            keep = np.abs(sizes_a[start + rows] - sizes_b[cols]) <= self.max_token_diff
+            rows, cols, inter = rows[keep], cols[keep], inter[keep]
+            
+            scores = inter / (sizes_a[start + rows] + sizes_b[cols] - inter)
+            best_cols[start:stop], best_scores[start:stop] = self._select_top(rows, cols, scores, stop - start)
+        
+        return best_cols, best_scores
+    
+    @staticmethod
+    def _estimate_row_nnz(block_a: TokenizedCatalog, block_b: TokenizedCatalog,
+                          num_columns: int) -> np.ndarray:
+        """
+        預估每個供應商A產品在交集矩陣中的非零元素數
+        
+        每個詞彙貢獻其在供應商B的出現次數（df_A·df_B 的逐列拆分），上限為供應商B的產品數。
+        
+        Args:
+            block_a: 同一區塊內供應商A產品的詞彙目錄
+            block_b: 同一區塊內供應商B產品的詞彙目錄
+            num_columns: 詞彙編號總數
+            
+        Returns:
+            np.ndarray: 每個供應商A產品的預估非零元素數
+        """
+        doc_freq_b = np.bincount(block_b.token_ids, minlength=num_columns)
+        cumulative = np.concatenate(([0], np.cumsum(doc_freq_b[block_a.token_ids], dtype=np.int64)))
+        row_nnz = cumulative[block_a.offsets[1:]] - cumulative[block_a.offsets[:-1]]
+        return np.minimum(row_nnz, len(block_b))
+    
+    @staticmethod
+    def _nnz_chunks(row_nnz: np.ndarray, max_nnz: int) -> List[Tuple[int, int]]:
+        """
+        依每列預估的非零元素數切分批次，每批總和不超過上限（單列超過上限時自成一批）
+        
+        Args:
+            row_nnz: 每列預估的非零元素數
+            max_nnz: 每批的非零元素數上限
+            
+        Returns:
+            List[Tuple[int, int]]: 批次的 (起始列, 結束列) 列表
+        """
+        cumulative = np.cumsum(row_nnz, dtype=np.int64)
+        chunks = []
+        start = 0
+        while start < len(row_nnz):
+            budget = max_nnz + (cumulative[start - 1] if start else 0)
+            stop = max(start + 1, int(np.searchsorted(cumulative, budget, side='right')))
+            chunks.append((start, stop))
+            start = stop
+        return chunks
+    
+    def _select_top(self, rows: np.ndarray, cols: np.ndarray, scores: np.ndarray,
+                    num_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        從 (列, 欄, 相似度) 組合中選出每列的前 K 名比對，同分時取欄位最小者
         
-        # 只比對相同國家的產品
-        df_b_filtered = df_b[df_b['product_location_country'] == country]
+        Args:
+            rows: 供應商A位置
+            cols: 供應商B位置
+            scores: Jaccard 相似度
+            num_rows: 供應商A產品數
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (前 K 名的B位置，形狀為 (產品數, K)，無比對為 -1；對應相似度)
+        """
+        k = self._k
+        best_cols = np.full((num_rows, k), -1, dtype=np.int64)
+        best_scores = np.zeros((num_rows, k), dtype=np.float64)
+        if len(rows) == 0:
+            return best_cols, best_scores
         
-        best_score = 0
-        best_b_row = None
+        # 依 (列, 相似度由高到低, 欄位由小到大) 排序，每列的前 K 筆即為前 K 名
+        order = np.lexsort((cols, -scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        starts = np.ones(len(rows), dtype=bool)
+        starts[1:] = rows[1:] != rows[:-1]
+        group_starts = np.flatnonzero(starts)
+        ranks = np.arange(len(rows)) - np.repeat(group_starts, np.diff(np.append(group_starts, len(rows))))
         
-        for _, row_b in df_b_filtered.iterrows():
-            tokens_b = self.tokenize(row_b.get('product_name_en', ''))
+        keep = ranks < k
+        best_cols[rows[keep], ranks[keep]] = cols[keep]
+        best_scores[rows[keep], ranks[keep]] = scores[keep]
+        return best_cols, best_scores
+    
+    def _best_matches_indexed(self, block_a: TokenizedCatalog, block_b: TokenizedCatalog) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        以區塊內倒排索引找出每個供應商A產品的最佳比對
+        
+        Args:
+            block_a: 同一國家區塊內供應商A產品的詞彙目錄
+            block_b: 同一國家區塊內供應商B產品的詞彙目錄
             
-            # 如果詞彙數量差異太大，跳過比較
-            if abs(len(tokens_a) - len(tokens_b)) > self.max_token_diff:
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (前 K 名的B位置，形狀為 (產品數, K)，無比對為 -1；對應相似度)
+        """
+        postings = block_b.postings()
+        
+        best_cols = np.full((len(block_a), self._k), -1, dtype=np.int64)
+        best_scores = np.zeros((len(block_a), self._k), dtype=np.float64)
+        for row in range(len(block_a)):
+            cols, scores = self._top_candidates(
+                postings, block_b.counts, block_a.tokens(row), int(block_a.counts[row])
+            )
+            best_cols[row, :len(cols)] = cols
+            best_scores[row, :len(scores)] = scores
+        
+        return best_cols, best_scores
+    
+    @staticmethod
+    def _order_by_frequency(block_a: TokenizedCatalog, block_b: TokenizedCatalog) -> Tuple[List[List[int]], List[List[int]]]:
+        """
+        依全域詞彙順序（出現次數少的詞排前面）重新排列每個產品的詞彙
+        
+        Args:
+            block_a: 供應商A產品的詞彙目錄
+            block_b: 供應商B產品的詞彙目錄
+            
+        Returns:
+            Tuple: (供應商A各產品的詞彙順位列表, 供應商B各產品的詞彙順位列表)
+        """
+        unique_ids, frequencies = np.unique(
+            np.concatenate((block_a.token_ids, block_b.token_ids)), return_counts=True
+        )
+        ranks = np.empty(len(unique_ids), dtype=np.int64)
+        ranks[np.lexsort((unique_ids, frequencies))] = np.arange(len(unique_ids))
+        
+        def reorder(block: TokenizedCatalog) -> List[List[int]]:
+            token_ranks = ranks[np.searchsorted(unique_ids, block.token_ids)]
+            owners = np.repeat(np.arange(len(block)), block.counts)
+            token_ranks = token_ranks[np.lexsort((token_ranks, owners))].tolist()
+            offsets = block.offsets.tolist()
+            return [token_ranks[offsets[i]:offsets[i + 1]] for i in range(len(block))]
+        
+        return reorder(block_a), reorder(block_b)
+    
+    def _prefix_length(self, size: int) -> int:
+        """
+        計算前綴長度：相似度達門檻的兩個產品，其前綴至少共享一個詞彙
+        
+        Args:
+            size: 產品詞彙數
+            
+        Returns:
+            int: 前綴長度
+        """
+        required = math.ceil(self.similarity_threshold * size - self._EPSILON)
+        return max(0, min(size, size - required + 1))
+    
+    def _best_matches_prefix(self, block_a: TokenizedCatalog, block_b: TokenizedCatalog) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        以長度過濾、前綴過濾與位置過濾（AllPairs/PPJoin）找出每個供應商A產品的最佳比對
+        
+        只有可能達到相似度門檻的組合才會計算 Jaccard 相似度，
+        因此門檻值越高，需要驗證的組合越少；門檻以上的最佳比對與完整掃描相同。
+        
+        Args:
+            block_a: 同一國家區塊內供應商A產品的詞彙目錄
+            block_b: 同一國家區塊內供應商B產品的詞彙目錄
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (前 K 名的B位置，形狀為 (產品數, K)，無比對為 -1；對應相似度)
+        """
+        k = self._k
+        best_cols = np.full((len(block_a), k), -1, dtype=np.int64)
+        best_scores = np.zeros((len(block_a), k), dtype=np.float64)
+        if len(block_a) == 0 or len(block_b) == 0:
+            return best_cols, best_scores
+        
+        threshold = self.similarity_threshold
+        ordered_a, ordered_b = self._order_by_frequency(block_a, block_b)
+        sets_b = [set(tokens) for tokens in ordered_b]
+        counts_b = block_b.counts.tolist()
+        
+        # 只索引供應商B的前綴；依詞彙數排序，查詢時以二分搜尋套用長度過濾
+        index_lengths: Dict[int, List[int]] = {}
+        index_entries: Dict[int, List[Tuple[int, int]]] = {}
+        for col in np.lexsort((np.arange(len(block_b)), block_b.counts)).tolist():
+            size = counts_b[col]
+            for position, token in enumerate(ordered_b[col][:self._prefix_length(size)]):
+                index_lengths.setdefault(token, []).append(size)
+                index_entries.setdefault(token, []).append((col, position))
+        
+        for row, tokens in enumerate(ordered_a):
+            size_a = len(tokens)
+            if size_a == 0:
                 continue
             
-            # 計算 Jaccard 相似度
-            jaccard_score = self.calculate_jaccard_similarity(tokens_a, tokens_b)
+            # 長度過濾：相似度門檻與最大詞彙數量差異決定可比對的詞彙數範圍
+            min_size = max(1, size_a - self.max_token_diff,
+                           math.ceil(threshold * size_a - self._EPSILON))
+            max_size = size_a + self.max_token_diff
+            if threshold > 0:
+                max_size = min(max_size, math.floor(size_a / threshold + self._EPSILON))
             
-            if jaccard_score > best_score:
-                best_score = jaccard_score
-                best_b_row = row_b
+            overlaps: Dict[int, int] = {}
+            for position_a, token in enumerate(tokens[:self._prefix_length(size_a)]):
+                lengths = index_lengths.get(token)
+                if lengths is None:
+                    continue
+                entries = index_entries[token]
+                for entry in range(bisect_left(lengths, min_size), bisect_right(lengths, max_size)):
+                    col, position_b = entries[entry]
+                    overlap = overlaps.get(col, 0)
+                    if overlap < 0:
+                        continue
+                    
+                    # 位置過濾：已知交集數加上剩餘詞彙數仍不足門檻所需交集數時排除
+                    size_b = lengths[entry]
+                    required = math.ceil(threshold / (1 + threshold) * (size_a + size_b) - self._EPSILON)
+                    upper_bound = overlap + 1 + min(size_a - position_a - 1, size_b - position_b - 1)
+                    overlaps[col] = overlap + 1 if upper_bound >= required else -1
+            
+            # 驗證候選組合，以固定大小的堆積保留前 K 名；同分時取原始順序最前面的產品
+            token_set = set(tokens)
+            heap: List[Tuple[float, int]] = []
+            for col in sorted(col for col, overlap in overlaps.items() if overlap > 0):
+                intersection = len(token_set & sets_b[col])
+                jaccard_score = intersection / (size_a + counts_b[col] - intersection)
+                if jaccard_score < threshold or jaccard_score <= 0:
+                    continue
+                if len(heap) < k:
+                    heapq.heappush(heap, (jaccard_score, -col))
+                elif (jaccard_score, -col) > heap[0]:
+                    heapq.heapreplace(heap, (jaccard_score, -col))
+            
+            for rank, (jaccard_score, negative_col) in enumerate(sorted(heap, reverse=True)):
+                best_cols[row, rank] = -negative_col
+                best_scores[row, rank] = jaccard_score
         
-        # 只保留相似度 >= 門檻值的結果
-        if best_b_row is not None and best_score >= self.similarity_threshold:
-            vendor_a_price = row_a.get('price', 0) or 0
-            vendor_b_price = best_b_row.get('price', 0) or 0
-            price_diff = vendor_b_price - vendor_a_price
-            
-            results.append({
-                'product_location_country': country,
-                'vendor_A_product_id': row_a.get('product_id', ''),
-                'vendor_A_product_name': row_a.get('product_name', ''),
-                'vendor_A_product_name_en': row_a.get('product_name_en', ''),
-                'vendor_A_price': vendor_a_price,
-                'vendor_B_product_id': best_b_row.get('product_id', ''),
-                'vendor_B_product_name': best_b_row.get('product_name', ''),
-                'vendor_B_product_name_en': best_b_row.get('product_name_en', ''),
-                'vendor_B_price': vendor_b_price,
-                'jaccard_score': best_score,
-                'price_diff': price_diff
-            })
+        return best_cols, best_scores
+    
+    def _minhash_signatures(self, block: TokenizedCatalog, chunk_size: int = 2000) -> np.ndarray:
+        """
+        計算每個產品的 MinHash 簽章
         
-        return results
+        以 (a * 詞彙編號 + b) mod p 模擬隨機排列，詞彙編號兩個供應商共用，
+        因此相同詞彙在兩邊得到相同的雜湊值。
+        
+        Args:
+            block: 產品的詞彙目錄
+            chunk_size: 每批計算的產品數，限制中間陣列的記憶體用量
+            
+        Returns:
+            np.ndarray: 形狀為 (產品數, bands * rows) 的簽章，無詞彙的產品為最大值
+        """
+        num_perm = self.lsh_bands * self.lsh_rows
+        rng = np.random.default_rng(self.lsh_seed)
+        coef_a = rng.integers(1, self._MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+        coef_b = rng.integers(0, self._MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+        
+        signatures = np.full((len(block), num_perm), self._MINHASH_PRIME, dtype=np.uint64)
+        for start in range(0, len(block), chunk_size):
+            stop = min(start + chunk_size, len(block))
+            counts = block.counts[start:stop]
+            non_empty = np.flatnonzero(counts > 0)
+            if len(non_empty) == 0:
+                continue
+            
+            token_ids = block.token_ids[block.offsets[start]:block.offsets[stop]].astype(np.uint64)
+            hashes = (np.outer(token_ids, coef_a) + coef_b) % self._MINHASH_PRIME
+            segment_starts = (block.offsets[start:stop] - block.offsets[start])[non_empty]
+            signatures[start + non_empty] = np.minimum.reduceat(hashes, segment_starts, axis=0)
+        
+        return signatures
+    
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        將簽章切成 bands 段，每段雜湊成一個 64 位元的分桶鍵值
+        
+        Args:
+            signatures: MinHash 簽章
+            
+        Returns:
+            np.ndarray: 形狀為 (產品數, bands) 的分桶鍵值
+        """
+        rows = self.lsh_rows
+        multipliers = np.uint64(0x9E3779B97F4A7C15) ** np.arange(1, rows + 1, dtype=np.uint64)
+        bands = signatures.reshape(len(signatures), self.lsh_bands, rows)
+        # 無號整數溢位即為 mod 2^64，相同的段落必定得到相同鍵值
+        return (bands * multipliers).sum(axis=2, dtype=np.uint64)
+    
+    def _best_matches_minhash(self, block_a: TokenizedCatalog, block_b: TokenizedCatalog) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        以 MinHash + LSH 分桶取得候選組合，再以精確 Jaccard 相似度驗證
+        
+        至少有一段簽章完全相同的組合才會成為候選，bands 越多、rows 越少召回率越高但候選越多。
+        
+        Args:
+            block_a: 同一國家區塊內供應商A產品的詞彙目錄
+            block_b: 同一國家區塊內供應商B產品的詞彙目錄
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (前 K 名的B位置，形狀為 (產品數, K)，無比對為 -1；對應相似度)
+        """
+        keys_a = self._band_keys(self._minhash_signatures(block_a))
+        keys_b = self._band_keys(self._minhash_signatures(block_b))
+        valid_a = block_a.counts > 0
+        valid_b = np.flatnonzero(block_b.counts > 0)
+        
+        pair_rows, pair_cols = [], []
+        for band in range(self.lsh_bands):
+            order = valid_b[np.argsort(keys_b[valid_b, band], kind='stable')]
+            sorted_keys = keys_b[order, band]
+            lo = np.searchsorted(sorted_keys, keys_a[:, band], side='left')
+            hi = np.searchsorted(sorted_keys, keys_a[:, band], side='right')
+            sizes = np.where(valid_a, hi - lo, 0)
+            
+            # 展開同一分桶內的所有 (A, B) 組合
+            rows = np.repeat(np.arange(len(block_a)), sizes)
+            within = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            pair_rows.append(rows)
+            pair_cols.append(order[np.repeat(lo, sizes) + within])
+        
+        pairs = np.unique(np.concatenate(pair_rows) * len(block_b) + np.concatenate(pair_cols))
+        rows, cols = pairs // len(block_b), pairs % len(block_b)
+        
+        # 詞彙數量差異太大的組合不列入比較
+        sizes_a, sizes_b = block_a.counts, block_b.counts
+        keep = np.abs(sizes_a[rows] - sizes_b[cols]) <= self.max_token_diff
+        rows, cols = rows[keep], cols[keep]
+        
+        # 精確驗證：以稀疏矩陣逐列相乘取得交集數
+        num_columns = int(max(block_a.token_ids.max(initial=-1), block_b.token_ids.max(initial=-1))) + 1
+        inter = np.asarray(
+            block_a.to_csr(num_columns)[rows].multiply(block_b.to_csr(num_columns)[cols]).sum(axis=1)
+        ).ravel().astype(np.float64)
+        
+        keep = inter > 0
+        rows, cols, inter = rows[keep], cols[keep], inter[keep]
+        scores = inter / (sizes_a[rows] + sizes_b[cols] - inter)
+        return self._select_top(rows, cols, scores, len(block_a))
+    
+    def _best_matches_block(self, block_a: TokenizedCatalog, block_b: TokenizedCatalog,
+                            engine: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        依比對引擎找出區塊內每個供應商A產品的最佳比對
+        
+        Args:
+            block_a: 同一國家區塊內供應商A產品的詞彙目錄
+            block_b: 同一國家區塊內供應商B產品的詞彙目錄
+            engine: 比對引擎
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (前 K 名的B位置，形狀為 (產品數, K)，無比對為 -1；對應相似度)
+        """
+        if engine == 'sparse':
+            return self._best_matches_sparse(block_a, block_b)
+        if engine == 'prefix':
+            return self._best_matches_prefix(block_a, block_b)
+        if engine == 'minhash':
+            return self._best_matches_minhash(block_a, block_b)
+        return self._best_matches_indexed(block_a, block_b)
+    
+    def _build_shards(self, df_a: pd.DataFrame, df_b: pd.DataFrame, chunk_size: int):
+        """
+        依比對區塊切分比對工作，大型區塊再將供應商A切成多個分片
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            chunk_size: 每個分片的供應商A產品數上限
+            
+        Returns:
+            Tuple[List, int]: (分片列表 [(A位置, B位置)], 沒有對應區塊的A產品數)
+        """
+        shards = []
+        unmatched = len(df_a)
+        for positions_a, positions_b in self.build_blocks(df_a, df_b).values():
+            unmatched -= len(positions_a)
+            for start in range(0, len(positions_a), chunk_size):
+                shards.append((positions_a[start:start + chunk_size], positions_b))
+        
+        return shards, unmatched
+    
+    def _settings(self) -> Dict[str, Any]:
+        """取得重建比對器所需的設定（傳給工作行程）"""
+        return {
+            'similarity_threshold': self.similarity_threshold,
+            'max_token_diff': self.max_token_diff,
+            'sparse_max_nnz': self.sparse_max_nnz,
+            'lsh_bands': self.lsh_bands,
+            'lsh_rows': self.lsh_rows,
+            'lsh_seed': self.lsh_seed,
+            'blocking_keys': self.blocking_keys,
+            'price_band_width': self.price_band_width,
+            'top_k': self.top_k,
+            'tokenizer': self.tokenizer,
+            'ngram_sizes': self.ngram_sizes
+        }
+    
+    def _iter_catalog_matches(self, df_a: pd.DataFrame, df_b: pd.DataFrame,
+                              catalog_a: TokenizedCatalog, catalog_b: TokenizedCatalog, engine: str,
+                              n_jobs: int = 1, progress_callback=None, pool=None):
+        """
+        以國家區塊（分片）批次比對所有產品，每完成一個分片就產出其結果，可使用多個行程平行處理
+        
+        傳給工作行程的只有各分片的詞彙編號陣列，不會序列化整個 DataFrame。
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            catalog_a: 供應商A的詞彙目錄
+            catalog_b: 供應商B的詞彙目錄
+            engine: 比對引擎
+            n_jobs: 平行行程數，1 表示在目前行程執行
+            progress_callback: 進度回呼函數，參數為已處理的供應商A產品數
+            pool: 共用的行程池（可選，未提供且需要平行時每次呼叫各自建立）
+            
+        Yields:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (分片的A位置，前 K 名的B位置（形狀為 (分片產品數, K)，
+                                                        無比對為 -1），對應相似度)，依分片完成順序
+        """
+        # 分批處理供應商A以回報進度；平行時切得更細以平衡負載（交集矩陣的記憶體另依非零元素數限制）
+        chunk_size = self.sparse_chunk_size
+        if n_jobs > 1:
+            chunk_size = max(1, min(chunk_size, -(-len(df_a) // (n_jobs * 4))))
+        shards, processed = self._build_shards(df_a, df_b, chunk_size)
+        
+        if progress_callback is not None:
+            progress_callback(processed)
+        
+        settings = self._settings()
+        tasks = (
+            (shard_id, settings, engine, catalog_a.subset(positions_a), catalog_b.subset(positions_b))
+            for shard_id, (positions_a, positions_b) in enumerate(shards)
+        )
+        
+        def collect(shard_result):
+            nonlocal processed
+            shard_id, cols, scores = shard_result
+            positions_a, positions_b = shards[shard_id]
+            
+            processed += len(positions_a)
+            if progress_callback is not None:
+                progress_callback(processed)
+            return positions_a, np.where(cols >= 0, positions_b[np.maximum(cols, 0)], -1), scores
+        
+        if n_jobs > 1 and len(shards) > 1 and pool is not None:
+            for shard_result in pool.imap_unordered(_match_shard, tasks):
+                yield collect(shard_result)
+        elif n_jobs > 1 and len(shards) > 1:
+            with Pool(processes=min(n_jobs, len(shards))) as pool:
+                for shard_result in pool.imap_unordered(_match_shard, tasks):
+                    yield collect(shard_result)
+        else:
+            for task in tasks:
+                yield collect(_match_shard(task))
+    
+    def _match_catalogs(self, df_a: pd.DataFrame, df_b: pd.DataFrame,
+                        catalog_a: TokenizedCatalog, catalog_b: TokenizedCatalog, engine: str,
+                        n_jobs: int = 1, progress_callback=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        以國家區塊（分片）批次比對所有產品，收集成完整的結果陣列
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            catalog_a: 供應商A的詞彙目錄
+            catalog_b: 供應商B的詞彙目錄
+            engine: 比對引擎
+            n_jobs: 平行行程數，1 表示在目前行程執行
+            progress_callback: 進度回呼函數，參數為已處理的供應商A產品數
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 每個供應商A產品的 (前 K 名的B位置，形狀為 (產品數, K)，
+                                           無比對為 -1；對應相似度)
+        """
+        best_positions = np.full((len(df_a), self._k), -1, dtype=np.int64)
+        best_scores = np.zeros((len(df_a), self._k), dtype=np.float64)
+        
+        # 以位置寫回結果，與分片完成順序無關
+        for positions_a, positions_b, scores in self._iter_catalog_matches(
+            df_a, df_b, catalog_a, catalog_b, engine, n_jobs, progress_callback
+        ):
+            best_positions[positions_a] = positions_b
+            best_scores[positions_a] = scores
+        
+        return best_positions, best_scores
+    
+    def estimate_recall(self, df_a: pd.DataFrame, df_b: pd.DataFrame,
+                        catalog_a: TokenizedCatalog, catalog_b: TokenizedCatalog,
+                        approx_scores: np.ndarray, sample_size: int = None) -> Dict[str, Any]:
+        """
+        抽樣比較近似比對與精確比對的結果，估算近似比對的召回率
+        
+        召回率 = 精確比對有結果（相似度 >= 門檻）的抽樣產品中，近似比對找到同分最佳比對的比例。
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            catalog_a: 供應商A的詞彙目錄
+            catalog_b: 供應商B的詞彙目錄
+            approx_scores: 近似比對得到的每個供應商A產品相似度（形狀為 (產品數, K)）
+            sample_size: 抽樣數（可選，預設使用初始設定）
+            
+        Returns:
+            Dict: 召回率統計資訊
+        """
+        sample_size = min(sample_size or self.recall_sample_size, len(df_a))
+        rng = np.random.default_rng(self.lsh_seed)
+        sample = np.sort(rng.choice(len(df_a), size=sample_size, replace=False))
+        
+        exact_positions, exact_scores = self._match_catalogs(
+            df_a.iloc[sample], df_b, catalog_a.subset(sample), catalog_b, 'index'
+        )
+        # 以第一名比較：近似比對找到與精確比對同分的最佳比對即視為找到
+        expected = (exact_positions[:, 0] >= 0) & (exact_scores[:, 0] >= self.similarity_threshold)
+        found = expected & (approx_scores[sample, 0] == exact_scores[:, 0])
+        
+        expected_count = int(expected.sum())
+        return {
+            'recall': float(found.sum() / expected_count) if expected_count else 1.0,
+            'recall_sample_size': sample_size,
+            'recall_expected_matches': expected_count,
+            'recall_found_matches': int(found.sum())
+        }
+    
+    @staticmethod
+    def fill_english_names(df: pd.DataFrame, translate) -> pd.DataFrame:
+        """
+        翻譯缺少英文名稱的產品名稱；已提供的英文名稱保留不翻譯
+        
+        英文名稱欄位不存在、為空值或空白字串的產品視為缺少英文名稱。
+        
+        Args:
+            df: 產品資料
+            translate: 翻譯函數，參數為產品名稱 Series，返回等長的英文名稱 Series
+            
+        Returns:
+            pd.DataFrame: 含英文名稱的產品資料（不修改傳入的資料）
+        """
+        if 'product_name_en' not in df.columns:
+            # 以 assign 新增欄位（啟用寫入時複製時，即 pandas 3 或 enable_copy_on_write，也不會複製原本的欄位）
+            return df.assign(product_name_en=translate(df['product_name']))
+        
+        missing = np.fromiter(
+            (pd.isna(name) or (isinstance(name, str) and not name.strip()) for name in df['product_name_en']),
+            dtype=bool, count=len(df)
+        )
+        if not missing.any():
+            return df
+        
+        names_en = df['product_name_en'].to_numpy(dtype=object, copy=True)
+        names_en[missing] = translate(df['product_name'][missing]).to_numpy(dtype=object)
+        return df.assign(product_name_en=names_en)
+    
+    @staticmethod
+    def _translate_names(df: pd.DataFrame, translator) -> pd.DataFrame:
+        """
+        以翻譯器翻譯缺少英文名稱的產品名稱
+        
+        Args:
+            df: 產品資料
+            translator: 翻譯器實例（可為 None），需提供 translate_series 或 translate_to_english
+            
+        Returns:
+            pd.DataFrame: 含英文名稱的產品資料
+        """
+        if translator is None:
+            return df
+        
+        # 翻譯服務正規化並去除重複的名稱後只翻譯一次；
+        # 只提供 translate_to_english 的翻譯器則逐一翻譯不重複的名稱
+        translate = getattr(translator, 'translate_series', None)
+        if translate is None:
+            def translate(names: pd.Series) -> pd.Series:
+                return names.map({name: translator.translate_to_english(name) for name in names.dropna().unique()})
+        
+        return ProductMatcher.fill_english_names(df, translate)
+    
+    def _iter_match_chunks(self, df_a: pd.DataFrame, df_b: pd.DataFrame, engine: str,
+                           n_jobs: int, chunk_size: int, progress_callback=None, pool=None):
+        """
+        逐批產出比對結果與對應的供應商A產品位置
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            engine: 比對引擎
+            n_jobs: 平行行程數
+            chunk_size: 倒排索引逐列比對時，每批的供應商A產品數
+            progress_callback: 進度回呼函數，參數為已處理的供應商A產品數
+            pool: 共用的行程池（可選）
+            
+        Yields:
+            Tuple[List[int], List[Dict]]: (每筆結果的供應商A位置, 比對結果列表)
+        """
+        # 每次比對只斷詞一次，所有比對引擎共用
+        catalog_a, catalog_b, vocabulary = self.prepare_catalogs(df_a, df_b)
+        records_a = df_a.to_dict('records')
+        
+        self.last_run_stats = {'engine': engine}
+        
+        if engine != 'index' or n_jobs > 1:
+            records_b = df_b.to_dict('records')
+            best_scores = np.zeros((len(df_a), self._k), dtype=np.float64)
+            
+            for positions_a, positions_b, scores in self._iter_catalog_matches(
+                df_a, df_b, catalog_a, catalog_b, engine, n_jobs, progress_callback, pool
+            ):
+                best_scores[positions_a] = scores
+                order, results = [], []
+                matched = (positions_b >= 0) & (scores >= self.similarity_threshold)
+                for row, rank in zip(*np.nonzero(matched)):
+                    pos_a = int(positions_a[row])
+                    order.append(pos_a)
+                    results.append(self._build_result(
+                        records_a[pos_a], records_b[positions_b[row, rank]],
+                        float(scores[row, rank]), self._rank(int(rank) + 1)
+                    ))
+                yield order, results
+            
+            # 近似比對：抽樣與精確比對比較，回報召回率
+            if engine == 'minhash':
+                self.last_run_stats.update(
+                    self.estimate_recall(df_a, df_b, catalog_a, catalog_b, best_scores)
+                )
+                logger.info("MinHash LSH 召回率: %.3f (%s)", self.last_run_stats['recall'], self.last_run_stats)
+        else:
+            # 每次比對只區塊化並建立一次倒排索引，每個供應商A產品直接對應到所屬區塊
+            blocking_keys = self._active_blocking_keys(df_a.columns, df_b.columns)
+            index = self.build_index(df_b, catalog_b, vocabulary, blocking_keys)
+            block_of_a: List[Optional[Tuple]] = [None] * len(df_a)
+            for block_key, positions_a in self._group_positions(df_a, blocking_keys).items():
+                for position in positions_a.tolist():
+                    block_of_a[position] = block_key
+            
+            # 逐一比對產品，每 chunk_size 筆產出一次
+            for start in range(0, len(records_a), chunk_size):
+                order, results = [], []
+                for i in range(start, min(start + chunk_size, len(records_a))):
+                    row_results = self._match_row(records_a[i], catalog_a.tokens(i),
+                                                  int(catalog_a.counts[i]), index, block_of_a[i])
+                    order.extend([i] * len(row_results))
+                    results.extend(row_results)
+                    if progress_callback is not None:
+                        progress_callback(i + 1)
+                yield order, results
+    
+    def _iter_lazy_match_chunks(self, df_a: pd.DataFrame, df_b: pd.DataFrame, translator, engine: str,
+                                n_jobs: int, chunk_size: int, progress_callback=None):
+        """
+        延遲翻譯：只翻譯兩個供應商都有的國家，依國家區塊大小（由大到小）逐一翻譯並比對
+        
+        翻譯在背景執行緒依序進行，目前國家比對時下一個國家已在翻譯，讓翻譯 I/O 與比對計算重疊。
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            translator: 翻譯器實例
+            engine: 比對引擎
+            n_jobs: 平行行程數
+            chunk_size: 倒排索引逐列比對時，每批的供應商A產品數
+            progress_callback: 進度回呼函數，參數為已處理的供應商A產品數
+            
+        Yields:
+            Tuple[List[int], List[Dict]]: (每筆結果的供應商A位置, 比對結果列表)
+        """
+        groups_a = df_a.groupby('product_location_country', sort=False, observed=True).indices
+        groups_b = df_b.groupby('product_location_country', sort=False, observed=True).indices
+        countries = sorted(
+            (country for country in groups_a if country in groups_b),
+            key=lambda country: len(groups_a[country]) + len(groups_b[country]), reverse=True
+        )
+        translated_a = sum(len(groups_a[country]) for country in countries)
+        translated_b = sum(len(groups_b[country]) for country in countries)
+        
+        # 沒有共同國家的供應商A產品不會有比對結果，直接計入進度
+        processed = len(df_a) - translated_a
+        if progress_callback is not None:
+            progress_callback(processed)
+        
+        def translate_block(country):
+            return (self._translate_names(df_a.iloc[groups_a[country]], translator),
+                    self._translate_names(df_b.iloc[groups_b[country]], translator))
+        
+        recall_keys = ('recall_sample_size', 'recall_expected_matches', 'recall_found_matches')
+        recall_totals = dict.fromkeys(recall_keys, 0)
+        
+        # 整次執行共用一個行程池，避免每個國家區塊各自建立行程；
+        # 於翻譯執行緒啟動前建立，fork 時不會複製到執行中的執行緒
+        pool = Pool(processes=n_jobs) if n_jobs > 1 else None
+        
+        # 單一背景執行緒依國家順序翻譯，翻譯結果備妥的國家立即開始比對
+        executor = ThreadPoolExecutor(max_workers=1)
+        futures = []
+        try:
+            futures = [executor.submit(translate_block, country) for country in countries]
+            for country, future in zip(countries, futures):
+                block_a, block_b = future.result()
+                positions_a = groups_a[country]
+                offset = processed
+                
+                def block_progress(done: int):
+                    if progress_callback is not None:
+                        progress_callback(offset + done)
+                
+                for order, results in self._iter_match_chunks(block_a, block_b, engine, n_jobs,
+                                                              chunk_size, block_progress, pool):
+                    yield positions_a[order].tolist(), results
+                
+                processed += len(positions_a)
+                for key in recall_keys:
+                    recall_totals[key] += self.last_run_stats.get(key, 0)
+        finally:
+            # 中途停止時取消尚未開始的翻譯（相容 Python 3.8，不使用 cancel_futures）
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            if pool is not None:
+                # 與 with Pool(...) 相同：結束時終止工作行程
+                pool.terminate()
+                pool.join()
+        
+        self.last_run_stats = {
+            'engine': engine,
+            'lazy_translation': True,
+            'shared_countries': len(countries),
+            'translated_a': translated_a,
+            'translated_b': translated_b,
+            'skipped_a': len(df_a) - translated_a,
+            'skipped_b': len(df_b) - translated_b
+        }
+        if engine == 'minhash':
+            expected = recall_totals['recall_expected_matches']
+            self.last_run_stats.update(recall_totals)
+            self.last_run_stats['recall'] = recall_totals['recall_found_matches'] / expected if expected else 1.0
+        logger.info("延遲翻譯: 翻譯 %d/%d 筆供應商A、%d/%d 筆供應商B產品",
+                    translated_a, len(df_a), translated_b, len(df_b))
+    
+    def _prepare_run(self, df_a: pd.DataFrame, df_b: pd.DataFrame, similarity_threshold: float,
+                     translator, engine: str, n_jobs: Optional[int], top_k: Optional[int],
+                     lazy_translation: bool = False):
+        """
+        套用單次比對的設定覆蓋並翻譯產品名稱
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            similarity_threshold: 相似度門檻（可為 None）
+            translator: 翻譯器實例（可為 None）
+            engine: 比對引擎（可為 None）
+            n_jobs: 平行行程數（可為 None）
+            top_k: 前 K 名（可為 None）
+            lazy_translation: 是否延遲到比對時才翻譯（此時不先翻譯）
+        
+        Returns:
+            Tuple: (供應商A資料, 供應商B資料, 比對引擎, 平行行程數)
+        """
+        # 使用傳入的門檻值或預設值
+        if similarity_threshold is not None:
+            self.similarity_threshold = similarity_threshold
+        if top_k is not None:
+            self.top_k = top_k
+        
+        engine = engine or self.engine
+        if engine not in self.ENGINES:
+            raise ValueError(f"不支援的比對引擎: {engine}，可用引擎: {', '.join(self.ENGINES)}")
+        
+        n_jobs = self._resolve_n_jobs(self.n_jobs if n_jobs is None else n_jobs)
+        
+        # 如果有翻譯器，先翻譯產品名稱（字元 n-gram 斷詞直接比對中文名稱，不需翻譯）
+        if not lazy_translation and self.tokenizer != 'cjk_ngram':
+            df_a = self._translate_names(df_a, translator)
+            df_b = self._translate_names(df_b, translator)
+        return df_a, df_b, engine, n_jobs
+    
+    def _iter_run_chunks(self, df_a: pd.DataFrame, df_b: pd.DataFrame, translator, engine: str,
+                         n_jobs: int, chunk_size: int, lazy_translation: bool, progress_callback=None):
+        """
+        依翻譯模式選擇逐批比對的方式
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            translator: 翻譯器實例（可為 None）
+            engine: 比對引擎
+            n_jobs: 平行行程數
+            chunk_size: 倒排索引逐列比對時，每批的供應商A產品數
+            lazy_translation: 是否延遲翻譯
+            progress_callback: 進度回呼函數，參數為已處理的供應商A產品數
+            
+        Returns:
+            Iterator: (每筆結果的供應商A位置, 比對結果列表)
+        """
+        if lazy_translation and translator is not None and self.tokenizer != 'cjk_ngram':
+            return self._iter_lazy_match_chunks(df_a, df_b, translator, engine, n_jobs,
+                                                chunk_size, progress_callback)
+        return self._iter_match_chunks(df_a, df_b, engine, n_jobs, chunk_size, progress_callback)
+    
+    def iter_matches(self, df_a: pd.DataFrame, df_b: pd.DataFrame,
+                     similarity_threshold: float = None, translator=None,
+                     engine: str = None, n_jobs: int = None, top_k: int = None,
+                     chunk_size: int = 1000, progress_callback: ProgressCallback = None,
+                     progress_interval: float = 0.2, progress_fraction: float = 0.01,
+                     lazy_translation: bool = False):
+        """
+        以產生器逐批產出比對結果，不依賴任何介面，適合批次工作
+        
+        倒排索引引擎每 chunk_size 個供應商A產品產出一批；其他引擎與平行比對每完成一個分片產出一批，
+        順序為分片完成順序。沒有結果的批次不會產出。
+        
+        Args:
+            df_a: 供應商A的產品資料
+            df_b: 供應商B的產品資料
+            similarity_threshold: 相似度門檻（可選，覆蓋初始設定）
+            translator: 翻譯器實例（可選）
+            engine: 比對引擎（可選，覆蓋初始設定）
+            n_jobs: 平行行程數（可選，覆蓋初始設定；-1 表示使用所有 CPU）
+            top_k: 每個產品保留的前 K 名比對（可選，覆蓋初始設定）
+            chunk_size: 倒排索引引擎每批的供應商A產品數
+            progress_callback: 進度回呼函數，參數為 (已處理數, 總數)；依時間與百分比節流，不會逐筆呼叫
+            progress_interval: 兩次進度回報之間的最短秒數
+            progress_fraction: 兩次進度回報之間的最小進度變化
+            lazy_translation: 是否只翻譯兩邊都有的國家，並在各國翻譯完成後立即比對
+            
+        Yields:
+            pd.DataFrame: 一批比對結果（相似度 >= similarity_threshold）
+        """
+        if df_a is None or df_b is None:
+            return
+        
+        df_a, df_b, engine, n_jobs = self._prepare_run(
+            df_a, df_b, similarity_threshold, translator, engine, n_jobs, top_k, lazy_translation
+        )
+        progress = ThrottledProgress(progress_callback, len(df_a), progress_interval, progress_fraction)
+        
+        for _, results in self._iter_run_chunks(df_a, df_b, translator, engine, n_jobs, chunk_size,
+                                                lazy_translation, progress.update):
+            if results:
+                yield pd.DataFrame(results)
     
     def compare_products(self, df_a: pd.DataFrame, df_b: pd.DataFrame, 
                         similarity_threshold: float = None, translator=None,
-                        show_progress: bool = True) -> pd.DataFrame:
+                        show_progress: bool = None, progress_callback: ProgressCallback = None,
+                        engine: str = None, n_jobs: int = None, top_k: int = None,
+                        keep_candidates: bool = False, min_threshold: float = 0.0,
+                        lazy_translation: bool = False) -> pd.DataFrame:
         """
         比對兩個供應商的所有產品
         
@@ -125,56 +1522,87 @@ class ProductMatcher:
             df_b: 供應商B的產品資料
             similarity_threshold: 相似度門檻（可選，覆蓋初始設定）
             translator: 翻譯器實例（可選）
-            show_progress: 是否顯示進度條
+            show_progress: 已棄用且不再使用，請改用 progress_callback（保留此參數與位置以相容舊呼叫）
+            progress_callback: 進度回呼函數，參數為 (已處理數, 總數)；依時間與百分比節流
+            engine: 比對引擎（可選，覆蓋初始設定）
+            n_jobs: 平行行程數（可選，覆蓋初始設定；-1 表示使用所有 CPU）
+            top_k: 每個產品保留的前 K 名比對（可選，覆蓋初始設定），結果會加上 rank 名次欄位
+            keep_candidates: 是否以 min_threshold 比對並保留候選比對，之後可用 filter_by_threshold
+                             直接篩選任何不低於 candidates_threshold 的門檻，不需重新比對；
+                             以門檻剪枝的引擎（THRESHOLD_PRUNED_ENGINES）仍以 similarity_threshold 比對，
+                             避免低門檻讓剪枝失效
+            min_threshold: 保留候選比對時使用的最低門檻
+            lazy_translation: 是否只翻譯兩邊都有的國家，並在各國翻譯完成後立即比對，
+                              讓翻譯與比對重疊進行
             
         Returns:
-            pd.DataFrame: 比對結果
+            pd.DataFrame: 比對結果（相似度 >= similarity_threshold），依供應商A產品順序排列
         """
+        progress_callback = resolve_progress_callback(show_progress, progress_callback)
         if df_a is None or df_b is None:
             return pd.DataFrame()
         
-        # 使用傳入的門檻值或預設值
-        if similarity_threshold is not None:
-            self.similarity_threshold = similarity_threshold
+        df_a, df_b, engine, n_jobs = self._prepare_run(
+            df_a, df_b, similarity_threshold, translator, engine, n_jobs, top_k, lazy_translation
+        )
         
-        # 如果有翻譯器，先翻譯產品名稱
-        if translator is not None:
-            if 'product_name_en' not in df_a.columns:
-                df_a = df_a.copy()
-                df_a['product_name_en'] = df_a['product_name'].apply(
-                    lambda x: translator.translate_to_english(x)
-                )
-            
-            if 'product_name_en' not in df_b.columns:
-                df_b = df_b.copy()
-                df_b['product_name_en'] = df_b['product_name'].apply(
-                    lambda x: translator.translate_to_english(x)
-                )
+        # 保留候選比對時以最低門檻比對一次；最佳比對與門檻無關，較高門檻的結果即為其子集
+        requested_threshold = self.similarity_threshold
+        if keep_candidates and engine not in self.THRESHOLD_PRUNED_ENGINES:
+            self.similarity_threshold = min(min_threshold, requested_threshold)
+        candidates_threshold = self.similarity_threshold
         
-        all_results = []
+        progress = ThrottledProgress(progress_callback, len(df_a))
+        order, all_results = [], []
+        try:
+            for chunk_order, results in self._iter_run_chunks(
+                df_a, df_b, translator, engine, n_jobs, self.sparse_chunk_size,
+                lazy_translation, progress.update
+            ):
+                order.extend(chunk_order)
+                all_results.extend(results)
+        finally:
+            self.similarity_threshold = requested_threshold
         
-        if show_progress:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+        # 分片依完成順序產出，依供應商A產品位置還原順序（同一產品的名次順序不變）
+        sequence = np.argsort(np.asarray(order, dtype=np.int64), kind='stable')
+        matched_df = pd.DataFrame([all_results[i] for i in sequence])
         
-        # 逐一比對產品
-        for i, (_, row_a) in enumerate(df_a.iterrows()):
-            results = self.compare_single_product(row_a.to_dict(), df_b)
-            all_results.extend(results)
-            
-            if show_progress:
-                progress = (i + 1) / len(df_a)
-                progress_bar.progress(progress)
-                status_text.text(f"比對進度: {i + 1}/{len(df_a)} ({progress:.1%})")
+        if keep_candidates:
+            self.candidates = matched_df
+            self.candidates_threshold = candidates_threshold
+            return self.filter_by_threshold(requested_threshold)
+        
+        return matched_df
+    
+    @staticmethod
+    def filter_candidates(candidates: pd.DataFrame, threshold: float) -> pd.DataFrame:
+        """
+        從保留的候選比對中篩選出相似度 >= 門檻的結果
         
-        if show_progress:
-            progress_bar.empty()
-            status_text.empty()
+        Args:
+            candidates: 以較低門檻比對得到的結果
+            threshold: 新的相似度門檻（不可低於比對時使用的門檻）
+            
+        Returns:
+            pd.DataFrame: 與以新門檻重新比對相同的結果
+        """
+        if candidates is None or len(candidates) == 0:
+            return pd.DataFrame() if candidates is None else candidates.copy()
         
-        # 合併結果
-        matched_df = pd.DataFrame(all_results)
+        return candidates[candidates['jaccard_score'] >= threshold].reset_index(drop=True)
+    
+    def filter_by_threshold(self, threshold: float) -> pd.DataFrame:
+        """
+        以新的相似度門檻篩選最近一次保留的候選比對
         
-        return matched_df
+        Args:
+            threshold: 新的相似度門檻
+            
+        Returns:
+            pd.DataFrame: 比對結果
+        """
+        return self.filter_candidates(self.candidates, threshold)
     
     def analyze_results(self, matched_df: pd.DataFrame) -> Dict[str, Any]:
         """
@@ -196,6 +1624,10 @@ class ProductMatcher:
                 'country_stats': pd.DataFrame()
             }
         
+        # 保留前 K 名時，以每個產品的第一名計算統計
+        if 'rank' in matched_df.columns:
+            matched_df = matched_df[matched_df['rank'] == 1]
+        
         # 基本統計
         total_matches = len(matched_df)
         unique_countries = matched_df['product_location_country'].nunique()
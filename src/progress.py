@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+進度回報模組
+提供與介面無關的進度回呼節流，核心模組不直接依賴 Streamlit
+"""
+
+import time
+import warnings
+from typing import Callable, Optional
+
+# 進度回呼函數，參數為 (已處理數量, 總數量)
+ProgressCallback = Callable[[int, int], None]
+
+
+class ThrottledProgress:
+    """依時間間隔與進度百分比節流的進度回報器"""
+
+    def __init__(self, callback: Optional[ProgressCallback], total: int,
+                 min_interval: float = 0.2, min_fraction: float = 0.01):
+        """
+        初始化進度回報器
+
+        Args:
+            callback: 進度回呼函數（可為 None，表示不回報）
+            total: 總數量
+            min_interval: 兩次回報之間的最短秒數
+            min_fraction: 兩次回報之間的最小進度變化（0.0-1.0）
+        """
+        self.callback = callback
+        self.total = total
+        self.min_interval = min_interval
+        self.min_fraction = min_fraction
+        self._last_done = 0
+        self._last_time = float('-inf')
+
+    def update(self, done: int) -> None:
+        """
+        更新進度，只有距離上次回報夠久且進度變化夠大時才呼叫回呼函數；完成時一定回報
+
+        Args:
+            done: 已處理數量
+        """
+        if self.callback is None:
+            return
+
+        now = time.monotonic()
+        finished = done >= self.total
+        if not finished:
+            if now - self._last_time < self.min_interval:
+                return
+            if self.total and (done - self._last_done) / self.total < self.min_fraction:
+                return
+
+        self._last_done = done
+        self._last_time = now
+        self.callback(done, self.total)
+
+    __call__ = update
+
+
+def resolve_progress_callback(show_progress: Optional[bool],
+                              progress_callback: Optional[ProgressCallback]) -> Optional[ProgressCallback]:
+    """
+    處理已棄用的 show_progress 參數，取得實際使用的進度回呼函數
+
+    show_progress 保留在原本的參數位置以相容舊呼叫，傳入時發出 DeprecationWarning 並忽略；
+    若在該位置傳入的是回呼函數，則視為 progress_callback。
+
+    Args:
+        show_progress: 已棄用的 show_progress 參數
+        progress_callback: 進度回呼函數
+
+    Returns:
+        Optional[ProgressCallback]: 進度回呼函數
+    """
+    if callable(show_progress) and progress_callback is None:
+        return show_progress
+    if show_progress is not None:
+        warnings.warn("show_progress 已棄用且不再使用，請改用 progress_callback",
+                      DeprecationWarning, stacklevel=3)
+    return progress_callback
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+翻譯後端模組
+定義翻譯後端介面，提供 Google 翻譯、本機測試用替身與旅遊詞彙表後端
+"""
+
+import re
+import time
+from deep_translator import GoogleTranslator
+from typing import Dict, List, Optional, Tuple
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# 常見旅遊詞彙與城市名稱（繁體中文 → 英文），由詞彙表後端在本機翻譯
+DEFAULT_TRAVEL_GLOSSARY: Dict[str, str] = {
+    # 行程類型
+    '一日遊': 'day tour', '半日遊': 'half day tour', '二日遊': '2 day tour', '兩日遊': '2 day tour',
+    '三日遊': '3 day tour', '觀光團': 'sightseeing tour', '攝影團': 'photography tour',
+    '之旅': 'tour', '自由行': 'independent tour', '包車': 'private charter', '跳島': 'island hopping',
+    '導覽': 'guided tour', '夜間': 'night', '日出': 'sunrise', '日落': 'sunset', '參觀': 'visit',
+    # 票券與交通
+    '門票': 'ticket', '入場券': 'admission ticket', '套票': 'package', '快速通關': 'express pass',
+    '通行證': 'pass', '接送': 'transfer', '機場接送': 'airport transfer', '含接送': 'with transfer',
+    '纜車': 'cable car', '遊船': 'cruise', '巴士': 'bus', '高鐵': 'high speed rail',
+    # 活動與設施
+    '體驗': 'experience', '溫泉': 'hot spring', '按摩': 'massage', '浮潛': 'snorkeling', '潛水': 'diving',
+    '購物': 'shopping', '免稅店': 'duty free shop', '夜市': 'night market', '水上市場': 'floating market',
+    '樂園': 'park', '主題樂園': 'theme park', '動物園': 'zoo', '野生動物園': 'safari park',
+    '水族館': 'aquarium', '公園': 'park', '文化村': 'culture village', '自助餐': 'buffet',
+    '料理課程': 'cooking class', '大皇宮': 'grand palace', '皇宮': 'royal palace', '王宮': 'royal palace',
+    # 城市與景點
+    '東京': 'Tokyo', '大阪': 'Osaka', '京都': 'Kyoto', '奈良': 'Nara', '北海道': 'Hokkaido',
+    '沖繩': 'Okinawa', '名古屋': 'Nagoya', '福岡': 'Fukuoka', '箱根': 'Hakone', '富士山': 'Mount Fuji',
+    '河口湖': 'Lake Kawaguchi', '迪士尼樂園': 'Disneyland', '環球影城': 'Universal Studios',
+    '首爾': 'Seoul', '釜山': 'Busan', '濟州島': 'Jeju Island', '明洞': 'Myeongdong',
+    '曼谷': 'Bangkok', '清邁': 'Chiang Mai', '普吉島': 'Phuket', '芭達雅': 'Pattaya',
+    '暹粒': 'Siem Reap', '金邊': 'Phnom Penh', '吳哥窟': 'Angkor Wat',
+    '新加坡': 'Singapore', '香港': 'Hong Kong', '台北': 'Taipei', '峇里島': 'Bali'
+}
+
+# 需要送到遠端翻譯的字元（中日韓文字）
+_CJK = re.compile(r'[぀-ヿ㐀-鿿가-힯豈-﫿]')
+
+
+class TranslationBackend:
+    """翻譯後端介面：子類別實作 translate，輸入可能包含以換行分隔的多個名稱"""
+    
+    # 後端名稱
+    name = 'base'
+    
+    # 翻譯結果是否適合寫入共用的持久化快取（測試替身不應污染共用快取）
+    persistent_cache = True
+    
+    def translate(self, text: str) -> str:
+        """
+        翻譯文字
+        
+        Args:
+            text: 要翻譯的文字
+        
+        Returns:
+            str: 翻譯後的文字
+        """
+        raise NotImplementedError
+
+
+class GoogleBackend(TranslationBackend):
+    """以 deep_translator 的 Google 翻譯為後端"""
+    
+    name = 'google'
+    
+    def __init__(self, source: str = 'zh-TW', target: str = 'en'):
+        """
+        初始化 Google 翻譯後端
+        
+        Args:
+            source: 來源語言
+            target: 目標語言
+        """
+        self.translator = GoogleTranslator(source=source, target=target)
+    
+    def translate(self, text: str) -> str:
+        return self.translator.translate(text)
+
+
+class StubBackend(TranslationBackend):
+    """確定性的本機翻譯替身，供測試與效能評估使用，不需網路"""
+    
+    name = 'stub'
+    persistent_cache = False
+    
+    def __init__(self, mapping: Dict[str, str] = None, latency: float = 0.0):
+        """
+        初始化翻譯替身
+        
+        Args:
+            mapping: 原文 → 譯文對應表（可選，未列出的文字原樣返回）
+            latency: 每次呼叫模擬的網路延遲秒數
+        """
+        self.mapping = dict(mapping or {})
+        self.latency = latency
+        self.calls = 0
+    
+    def translate(self, text: str) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        # 逐行翻譯，保留合併請求的分隔符號
+        return '\n'.join(self.mapping.get(line, line) for line in text.split('\n'))
+
+
+class GlossaryBackend(TranslationBackend):
+    """先以旅遊詞彙表在本機翻譯，只將無法對應的部分送到遠端後端"""
+    
+    name = 'glossary'
+    
+    def __init__(self, remote: Optional[TranslationBackend] = None, glossary: Dict[str, str] = None):
+        """
+        初始化詞彙表後端
+        
+        Args:
+            remote: 翻譯剩餘文字的遠端後端（可選，None 表示完全離線，剩餘文字原樣保留）
+            glossary: 詞彙表（可選，預設為 DEFAULT_TRAVEL_GLOSSARY）
+        """
+        self.remote = remote
+        self.glossary = dict(DEFAULT_TRAVEL_GLOSSARY if glossary is None else glossary)
+        self.persistent_cache = remote is not None and remote.persistent_cache
+        # 較長的詞彙優先比對（例如「野生動物園」優先於「動物園」）
+        terms = sorted(self.glossary, key=len, reverse=True)
+        self._pattern = re.compile('|'.join(map(re.escape, terms))) if terms else None
+        self.remote_calls = 0
+        self.resolved_locally = 0
+    
+    def _segment(self, line: str) -> List[Tuple[bool, str]]:
+        """
+        將一行文字切成詞彙表詞彙與未對應的片段
+        
+        Args:
+            line: 一行文字
+        
+        Returns:
+            List[Tuple[bool, str]]: (是否為詞彙表詞彙, 譯文或原文片段)
+        """
+        if self._pattern is None:
+            return [(False, line)]
+        
+        segments: List[Tuple[bool, str]] = []
+        position = 0
+        for match in self._pattern.finditer(line):
+            if match.start() > position:
+                segments.append((False, line[position:match.start()]))
+            segments.append((True, self.glossary[match.group()]))
+            position = match.end()
+        if position < len(line):
+            segments.append((False, line[position:]))
+        return segments
+    
+    @staticmethod
+    def _pending(lines: List[List[Tuple[bool, str]]]) -> List[Tuple[int, int]]:
+        """找出仍含中文、需要送到遠端翻譯的片段位置 (行, 片段)"""
+        return [
+            (i, j) for i, segments in enumerate(lines)
+            for j, (resolved, fragment) in enumerate(segments)
+            if not resolved and _CJK.search(fragment)
+        ]
+    
+    @staticmethod
+    def _join(lines: List[List[Tuple[bool, str]]]) -> str:
+        """將各行片段組合成譯文"""
+        return '\n'.join(
+            ' '.join(fragment.strip() for _, fragment in segments if fragment.strip())
+            for segments in lines
+        )
+    
+    def translate_locally(self, text: str) -> Optional[str]:
+        """
+        只以詞彙表翻譯，不呼叫遠端後端
+        
+        Args:
+            text: 要翻譯的文字
+        
+        Returns:
+            Optional[str]: 譯文；仍有片段需要遠端翻譯時為 None（沒有遠端後端時剩餘片段原樣保留）
+        """
+        lines = [self._segment(line) for line in text.split('\n')]
+        if self.remote is not None and self._pending(lines):
+            return None
+        self.resolved_locally += 1
+        return self._join(lines)
+    
+    def translate(self, text: str) -> str:
+        lines = [self._segment(line) for line in text.split('\n')]
+        
+        # 所有行中仍含中文的片段合併成一次遠端請求
+        pending = self._pending(lines)
+        if not pending:
+            self.resolved_locally += 1
+        elif self.remote is not None:
+            self.remote_calls += 1
+            fragments = [lines[i][j][1].strip() for i, j in pending]
+            translated = self.remote.translate('\n'.join(fragments))
+            parts = translated.split('\n') if isinstance(translated, str) else []
+            if len(parts) != len(fragments):
+                # 分隔符號被破壞時整段送到遠端翻譯
+                logger.info("詞彙表剩餘片段無法對應 (%d/%d)，改為整段翻譯", len(parts), len(fragments))
+                return self.remote.translate(text)
+            for (i, j), part in zip(pending, parts):
+                lines[i][j] = (True, part.strip())
+        
+        return self._join(lines)
+
+
+def create_backend(name: str = 'google', source: str = 'zh-TW', target: str = 'en',
+                   use_glossary: bool = False) -> TranslationBackend:
+    """
+    依名稱建立翻譯後端
+    
+    Args:
+        name: 後端名稱，'google' 或 'stub'
+        source: 來源語言
+        target: 目標語言
+        use_glossary: 是否在前面加上旅遊詞彙表的本機翻譯
+    
+    Returns:
+        TranslationBackend: 翻譯後端
+    """
+    backends = {
+        'google': lambda: GoogleBackend(source, target),
+        'stub': StubBackend
+    }
+    if name not in backends:
+        raise ValueError(f"不支援的翻譯後端: {name}，可用後端: {', '.join(backends)}")
+    
+    backend = backends[name]()
+    return GlossaryBackend(backend) if use_glossary else backend
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+翻譯快取模組
+提供可跨 session 與行程共用的翻譯快取（SQLite WAL 模式），以及行程內的記憶體快取
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# 預設快取檔案位置，可用環境變數 TRANSLATION_CACHE_PATH 覆蓋
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'travel_product_matching', 'translation_cache.sqlite3')
+
+# 預設最多保留的翻譯筆數
+DEFAULT_MAX_ENTRIES = 200_000
+
+_WHITESPACE = re.compile(r'\s+')
+
+# 匯出/匯入的一筆翻譯：(來源語言, 目標語言, 正規化原文, 譯文)
+CacheEntry = Tuple[str, str, str, str]
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+def normalize_cache_key(text: str) -> str:
+    """
+    正規化快取鍵值：Unicode NFKC（全形轉半形）、去除前後空白、合併連續空白
+
+    Args:
+        text: 原始文字
+
+    Returns:
+        str: 正規化後的鍵值
+    """
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+class MemoryTranslationCache:
+    """行程內的 LRU 翻譯快取"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        初始化記憶體快取
+
+        Args:
+            max_entries: 最多保留的翻譯筆數，超過時淘汰最久未使用的項目
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[tuple, str]' = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, text: str, source: str, target: str) -> Optional[str]:
+        """
+        查詢翻譯
+
+        Args:
+            text: 原文
+            source: 來源語言
+            target: 目標語言
+
+        Returns:
+            Optional[str]: 快取的譯文，沒有時為 None
+        """
+        key = (source, target, normalize_cache_key(text))
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, text: str, source: str, target: str, translation: str) -> None:
+        """
+        儲存翻譯
+
+        Args:
+            text: 原文
+            source: 來源語言
+            target: 目標語言
+            translation: 譯文
+        """
+        key = (source, target, normalize_cache_key(text))
+        with self._lock:
+            self._entries[key] = translation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def items(self) -> List[CacheEntry]:
+        """
+        取得所有翻譯（由最久未使用到最近使用）
+
+        Returns:
+            List[CacheEntry]: (來源語言, 目標語言, 原文, 譯文)
+        """
+        with self._lock:
+            return [(source, target, text, value) for (source, target, text), value in self._entries.items()]
+
+    def set_many(self, entries: Iterable[CacheEntry]) -> int:
+        """
+        批次儲存翻譯
+
+        Args:
+            entries: (來源語言, 目標語言, 原文, 譯文)
+
+        Returns:
+            int: 儲存的筆數
+        """
+        count = 0
+        for source, target, text, translation in entries:
+            self.set(text, source, target, translation)
+            count += 1
+        return count
+
+    def clear(self) -> None:
+        """清除所有翻譯與命中統計"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def sample(self, limit: int = 10) -> List[str]:
+        """
+        取得最近使用的快取原文
+
+        Args:
+            limit: 最多返回的筆數
+
+        Returns:
+            List[str]: 快取鍵值（正規化後的原文）
+        """
+        with self._lock:
+            return [key[2] for key in reversed(self._entries)][:limit]
+
+    def info(self) -> Dict:
+        """
+        獲取快取統計資訊
+
+        Returns:
+            Dict: 後端、筆數、上限、命中與未命中次數、命中率
+        """
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'cache_size': len(self),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+class SQLiteTranslationCache(MemoryTranslationCache):
+    """以 SQLite（WAL 模式）儲存的 LRU 翻譯快取，同一台機器上的所有 session 與行程共用"""
+
+    # 每寫入幾筆檢查一次上限，避免每次寫入都計算總筆數
+    EVICT_EVERY = 100
+
+    # 命中時的最後使用時間先記在記憶體，累積筆數或經過秒數達到門檻時以單一交易寫回
+    TOUCH_FLUSH_EVERY = 200
+    TOUCH_FLUSH_INTERVAL = 5.0
+
+    def __init__(self, path: str = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        初始化 SQLite 快取，資料表不存在時自動建立
+
+        Args:
+            path: 快取檔案路徑（可選，預設為環境變數 TRANSLATION_CACHE_PATH 或暫存目錄）
+            max_entries: 最多保留的翻譯筆數，超過時淘汰最久未使用的項目
+        """
+        super().__init__(max_entries)
+        self._writes = 0
+        self._touched: Dict[tuple, float] = {}
+        self._last_flush = time.monotonic()
+        self.path = path or os.getenv('TRANSLATION_CACHE_PATH') or DEFAULT_CACHE_PATH
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        # 連線在多個執行緒間共用，以鎖保護；跨行程的並行由 SQLite 處理
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    source TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (source, target, text)
+                )
+            """)
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)')
+            self._evict()
+
+    def get(self, text: str, source: str, target: str) -> Optional[str]:
+        key = normalize_cache_key(text)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT translation FROM translations WHERE source = ? AND target = ? AND text = ?',
+                (source, target, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._touched[(source, target, key)] = time.time()
+            if (len(self._touched) >= self.TOUCH_FLUSH_EVERY
+                    or time.monotonic() - self._last_flush >= self.TOUCH_FLUSH_INTERVAL):
+                self._flush_touched()
+            self.hits += 1
+            return row[0]
+
+    def _flush_touched(self) -> None:
+        """將累積的最後使用時間以單一交易寫回資料庫（呼叫端需持有鎖）"""
+        self._last_flush = time.monotonic()
+        if not self._touched:
+            return
+        rows = [(last_used, source, target, text) for (source, target, text), last_used in self._touched.items()]
+        self._touched.clear()
+        self._conn.execute('BEGIN')
+        try:
+            self._conn.executemany(
+                'UPDATE translations SET last_used = ? WHERE source = ? AND target = ? AND text = ?',
+                rows
+            )
+        except sqlite3.Error:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    def set(self, text: str, source: str, target: str, translation: str) -> None:
+        with self._lock:
+            self._touched.pop((source, target, normalize_cache_key(text)), None)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO translations (source, target, text, translation, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (source, target, normalize_cache_key(text), translation, time.time())
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict()
+
+    def set_many(self, entries: Iterable[CacheEntry]) -> int:
+        now = time.time()
+        rows = [(source, target, normalize_cache_key(text), translation, now)
+                for source, target, text, translation in entries]
+        with self._lock:
+            for source, target, text, _, _ in rows:
+                self._touched.pop((source, target, text), None)
+            # 以單一交易寫入，大量匯入時不必每筆同步磁碟
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO translations (source, target, text, translation, last_used) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    rows
+                )
+            except sqlite3.Error:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            self._evict()
+        return len(rows)
+
+    def _evict(self) -> None:
+        """超過上限時刪除最久未使用的翻譯（呼叫端需持有鎖）"""
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            self._flush_touched()
+            self._conn.execute(
+                'DELETE FROM translations WHERE rowid IN '
+                '(SELECT rowid FROM translations ORDER BY last_used LIMIT ?)',
+                (overflow,)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute('DELETE FROM translations')
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+
+    def items(self) -> List[CacheEntry]:
+        with self._lock:
+            self._flush_touched()
+            return self._conn.execute(
+                'SELECT source, target, text, translation FROM translations ORDER BY last_used'
+            ).fetchall()
+
+    def sample(self, limit: int = 10) -> List[str]:
+        with self._lock:
+            self._flush_touched()
+            rows = self._conn.execute(
+                'SELECT text FROM translations ORDER BY last_used DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def info(self) -> Dict:
+        info = super().info()
+        info.update({'backend': 'sqlite', 'path': self.path})
+        return info
+
+    def close(self) -> None:
+        """寫回累積的最後使用時間並關閉資料庫連線"""
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
+
+
+def open_translation_cache(path: str = None, max_entries: int = DEFAULT_MAX_ENTRIES) -> MemoryTranslationCache:
+    """
+    開啟共用的 SQLite 翻譯快取；檔案系統無法寫入時退回記憶體快取
+
+    Args:
+        path: 快取檔案路徑（可選）
+        max_entries: 最多保留的翻譯筆數
+
+    Returns:
+        MemoryTranslationCache: 翻譯快取
+    """
+    try:
+        return SQLiteTranslationCache(path, max_entries)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("無法開啟翻譯快取檔案，改用記憶體快取: %s", e)
+        return MemoryTranslationCache(max_entries)
+
+
+def export_cache(cache: MemoryTranslationCache, destination: Any, compress: bool = None) -> int:
+    """
+    將翻譯快取匯出為 JSON Lines（每行一筆 {"source", "target", "text", "translation"}）
+
+    Args:
+        cache: 翻譯快取
+        destination: 檔案路徑或可寫入位元組的檔案物件
+        compress: 是否以 gzip 壓縮（可選，檔案路徑預設依 .gz 副檔名判斷，檔案物件預設壓縮）
+
+    Returns:
+        int: 匯出的筆數
+    """
+    entries = cache.items()
+    lines = ''.join(
+        json.dumps({'source': source, 'target': target, 'text': text, 'translation': translation},
+                   ensure_ascii=False) + '\n'
+        for source, target, text, translation in entries
+    ).encode('utf-8')
+
+    is_path = isinstance(destination, (str, os.PathLike))
+    if compress is None:
+        compress = str(destination).endswith('.gz') if is_path else True
+    data = gzip.compress(lines) if compress else lines
+
+    if is_path:
+        with open(destination, 'wb') as f:
+            f.write(data)
+    else:
+        destination.write(data)
+    return len(entries)
+
+
+def import_cache(cache: MemoryTranslationCache, source: Any) -> int:
+    """
+    從 JSON Lines 檔案（可為 gzip 壓縮）匯入翻譯快取，略過格式錯誤的行
+
+    Args:
+        cache: 翻譯快取
+        source: 檔案路徑或可讀取位元組的檔案物件（例如 Streamlit 上傳的檔案）
+
+    Returns:
+        int: 匯入的筆數
+
+    Raises:
+        ValueError: 檔案不是有效的 gzip 或 UTF-8 內容
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            data = f.read()
+    else:
+        data = source.read()
+    try:
+        if data[:2] == _GZIP_MAGIC:
+            data = gzip.decompress(data)
+        text = data.decode('utf-8')
+    except (OSError, EOFError, UnicodeDecodeError) as e:
+        raise ValueError(f"翻譯快取檔案格式錯誤: {e}") from e
+
+    entries: List[CacheEntry] = []
+    skipped = 0
+    for line in io.StringIO(text):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            entry = (record['source'], record['target'], record['text'], record['translation'])
+        except (ValueError, KeyError, TypeError):
+            skipped += 1
+            continue
+        # 四個欄位都必須是非空字串，避免 null 等值寫入快取
+        if not all(isinstance(value, str) and value for value in entry):
+            skipped += 1
+            continue
+        entries.append(entry)
+
+    if skipped:
+        logger.warning("匯入翻譯快取時略過 %d 筆格式錯誤的資料", skipped)
+    return cache.set_many(entries)
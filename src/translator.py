@@ -5,20 +5,195 @@
 處理中文到英文的翻譯功能
 """
 
-from deep_translator import GoogleTranslator
-import streamlit as st
-from typing import Optional, List
+from deep_translator.exceptions import TooManyRequests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Optional, List, Tuple, Union
+import numpy as np
+import pandas as pd
+import re
+import threading
 import time
+import os
 import random
+import logging
+
+try:
+    from .progress import ProgressCallback, ThrottledProgress, resolve_progress_callback
+    from .translation_cache import (
+        MemoryTranslationCache, open_translation_cache, normalize_cache_key, export_cache, import_cache
+    )
+    from .translation_backends import TranslationBackend, GlossaryBackend, create_backend
+except ImportError:
+    from progress import ProgressCallback, ThrottledProgress, resolve_progress_callback
+    from translation_cache import (
+        MemoryTranslationCache, open_translation_cache, normalize_cache_key, export_cache, import_cache
+    )
+    from translation_backends import TranslationBackend, GlossaryBackend, create_backend
+
+
+logger = logging.getLogger(__name__)
+
+# NFKC 之後仍保留的中文標點，統一成對應的半形符號
+_PUNCTUATION_MAP = str.maketrans({
+    '、': ',', '，': ',', '。': '.', '：': ':', '；': ';',
+    '「': '"', '」': '"', '『': '"', '』': '"', '“': '"', '”': '"', '‘': "'", '’': "'",
+    '【': '(', '】': ')', '〔': '(', '〕': ')', '《': '(', '》': ')', '〈': '(', '〉': ')',
+    '〜': '~', '～': '~', '—': '-', '–': '-', '・': ' ', '·': ' '
+})
+
+# 合併翻譯時的分隔符號；正規化後的名稱不含換行，且翻譯 API 會保留換行
+PACK_DELIMITER = '\n'
+
+_REPEATED_PUNCTUATION = re.compile(r'([^\w\s])\1+')
+_SPACE_AROUND_BRACKETS = re.compile(r'\s*([()])\s*')
+
+
+def normalize_product_name(text) -> str:
+    """
+    翻譯前正規化產品名稱：全形轉半形、統一標點、合併重複標點與空白
+    
+    Args:
+        text: 產品名稱
+        
+    Returns:
+        str: 正規化後的產品名稱（非字串時為空字串）
+    """
+    if not isinstance(text, str):
+        return ""
+    text = normalize_cache_key(text).translate(_PUNCTUATION_MAP)
+    text = _REPEATED_PUNCTUATION.sub(r'\1', text)
+    text = _SPACE_AROUND_BRACKETS.sub(r'\1', text)
+    return normalize_cache_key(text).strip(' ,.;:-~')
+
+
+class TokenBucket:
+    """權杖桶限流器：平均每秒最多 rate 次請求，允許 capacity 次的突發"""
+    
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        初始化限流器
+        
+        Args:
+            rate: 每秒補充的權杖數（平均每秒請求數）
+            capacity: 桶的容量（可選，預設等於 rate，至少 1）
+        """
+        self.rate = rate
+        self.capacity = max(1.0, capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """取得一個權杖，沒有權杖時等待到補充為止（可由多個執行緒同時呼叫）"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _is_throttling_error(error: Exception) -> bool:
+    """
+    判斷例外是否為 API 限流錯誤
+    
+    Args:
+        error: 翻譯時發生的例外
+    
+    Returns:
+        bool: 是否為限流錯誤
+    """
+    if isinstance(error, TooManyRequests):
+        return True
+    message = str(error).lower()
+    return '429' in message or 'too many requests' in message
 
 
 class TranslationService:
     """翻譯服務類別"""
     
-    def __init__(self):
-        """初始化翻譯器"""
-        self.translator = GoogleTranslator(source='zh-TW', target='en')
-        self.translation_cache = {}  # 翻譯快取
+    def __init__(self, source: str = 'zh-TW', target: str = 'en',
+                 cache: Optional[MemoryTranslationCache] = None,
+                 backend: Optional[TranslationBackend] = None, use_glossary: bool = False,
+                 rate_limit: float = 5.0, burst: float = None, max_workers: int = 8,
+                 max_retries: int = 4, backoff_base: float = 0.5, pack_requests: bool = False,
+                 pack_max_chars: int = 4500, pack_max_items: int = 50):
+        """
+        初始化翻譯器
+        
+        Args:
+            source: 來源語言
+            target: 目標語言
+            cache: 翻譯快取（可選，預設為所有 session 與行程共用的 SQLite 快取；
+                   測試替身後端預設使用記憶體快取）
+            backend: 翻譯後端（可選，預設依環境變數 TRANSLATION_BACKEND 建立，未設定時為 Google 翻譯）
+            use_glossary: 是否先以旅遊詞彙表在本機翻譯，只將剩餘文字送到翻譯後端
+            rate_limit: 每秒最多送出的翻譯請求數
+            burst: 允許的突發請求數（可選，預設等於 rate_limit）
+            max_workers: 批次翻譯時同時進行中的請求上限
+            max_retries: 遇到限流錯誤時的最多重試次數
+            backoff_base: 指數退避的初始等待秒數，每次重試加倍
+            pack_requests: 是否將多個名稱以分隔符號合併成一次請求
+            pack_max_chars: 合併請求的字元數上限（需低於翻譯 API 的上限）
+            pack_max_items: 每次合併請求最多包含的名稱數
+        """
+        self.source = source
+        self.target = target
+        if backend is None:
+            backend = create_backend(os.getenv('TRANSLATION_BACKEND', 'google'), source, target)
+        self.backend = GlossaryBackend(backend) if use_glossary else backend
+        
+        # 翻譯快取；測試替身的結果不寫入共用快取
+        if cache is None:
+            cache = open_translation_cache() if self.backend.persistent_cache else MemoryTranslationCache()
+        self.translation_cache = cache
+        self.rate_limiter = TokenBucket(rate_limit, burst)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.pack_requests = pack_requests
+        self.pack_max_chars = pack_max_chars
+        self.pack_max_items = max(1, pack_max_items)
+        self.request_count = 0  # 已送出的翻譯請求數（不含重試）
+        self._count_lock = threading.Lock()
+        self._local = threading.local()  # 各執行緒目前翻譯單位送出的請求數
+        self.last_batch_stats = {}  # 最近一次批次翻譯的去重統計（服務由多個 session 共用時請改用 return_stats）
+    
+    def _request_translation(self, text: str) -> str:
+        """
+        送出一次翻譯請求，遵守限流設定，遇到限流錯誤時以指數退避重試
+        
+        Args:
+            text: 要翻譯的文字
+        
+        Returns:
+            str: 翻譯後的文字
+        """
+        # 詞彙表可在本機完成的翻譯不送出請求，不佔用限流額度也不計入請求數
+        if isinstance(self.backend, GlossaryBackend):
+            translated_text = self.backend.translate_locally(text)
+            if translated_text is not None:
+                return translated_text
+        
+        with self._count_lock:
+            self.request_count += 1
+        self._local.requests = getattr(self._local, 'requests', 0) + 1
+        
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self.backend.translate(text)
+            except Exception as e:
+                if attempt == self.max_retries or not _is_throttling_error(e):
+                    raise
+                # 加入隨機抖動，避免多個執行緒同時重試
+                delay = self.backoff_base * (2 ** attempt) * random.uniform(1.0, 1.5)
+                logger.info("翻譯 API 限流，%.2f 秒後重試 (%d/%d)", delay, attempt + 1, self.max_retries)
+                time.sleep(delay)
     
     def translate_to_english(self, text: str, use_cache: bool = True) -> str:
         """
@@ -27,7 +202,7 @@ class TranslationService:
         Args:
             text: 要翻譯的中文文字
             use_cache: 是否使用快取
-            
+        
         Returns:
             str: 翻譯後的英文文字
         """
@@ -35,61 +210,311 @@ class TranslationService:
             return ""
         
         # 檢查快取
-        if use_cache and text in self.translation_cache:
-            return self.translation_cache[text]
+        if use_cache:
+            cached = self.translation_cache.get(text, self.source, self.target)
+            if cached is not None:
+                return cached
         
-        try:
-            # 加入隨機延遲避免 API 限制
-            time.sleep(random.uniform(0.1, 0.3))
+        return self._translate_uncached(text, use_cache)
+    
+    def _translate_uncached(self, text: str, use_cache: bool = True) -> str:
+        """
+        送出單一文字的翻譯請求並存入快取，不查詢快取
+        
+        Args:
+            text: 要翻譯的文字
+            use_cache: 是否將結果存入快取
             
-            translated_text = self.translator.translate(text)
+        Returns:
+            str: 翻譯後的文字，翻譯失敗時為原文
+        """
+        try:
+            translated_text = self._request_translation(text)
             
             # 儲存到快取
-            if use_cache:
-                self.translation_cache[text] = translated_text
+            if use_cache and translated_text:
+                self.translation_cache.set(text, self.source, self.target, translated_text)
             
             return translated_text
-            
+        
         except Exception as e:
-            st.warning(f"⚠️ 翻譯失敗: {text} -> {str(e)}")
+            logger.warning("翻譯失敗: %s -> %s", text, e)
             return text  # 翻譯失敗時返回原文
     
-    def translate_batch(self, texts: List[str], show_progress: bool = True) -> List[str]:
+    def _pack_positions(self, texts: List[str], positions: List[int]) -> List[List[int]]:
         """
-        批次翻譯文字列表
+        將文字依序分組，每組合併後不超過字元數與名稱數上限
+        
+        Args:
+            texts: 文字列表
+            positions: 要分組的文字位置
+            
+        Returns:
+            List[List[int]]: 每組的文字位置
+        """
+        packs: List[List[int]] = []
+        current: List[int] = []
+        length = 0
+        
+        for position in positions:
+            size = len(texts[position]) + len(PACK_DELIMITER)
+            if current and (length + size > self.pack_max_chars or len(current) >= self.pack_max_items):
+                packs.append(current)
+                current, length = [], 0
+            current.append(position)
+            length += size
+        
+        if current:
+            packs.append(current)
+        return packs
+    
+    def _translate_pack(self, texts: List[str]) -> List[str]:
+        """
+        以一次請求翻譯多個文字；分隔符號被翻譯破壞時改為逐筆翻譯
+        
+        Args:
+            texts: 要翻譯的文字列表（不含換行）
+            
+        Returns:
+            List[str]: 翻譯後的文字列表
+        """
+        if len(texts) == 1:
+            return [self._translate_uncached(texts[0])]
+        
+        try:
+            response = self._request_translation(PACK_DELIMITER.join(texts))
+        except Exception as e:
+            logger.warning("合併翻譯失敗，改為逐筆翻譯: %s", e)
+            response = None
+        
+        parts = [part.strip() for part in response.split(PACK_DELIMITER)] if isinstance(response, str) else []
+        if len(parts) != len(texts) or not all(parts):
+            if response is not None:
+                logger.info("合併翻譯的分隔符號無法對應 (%d/%d)，改為逐筆翻譯", len(parts), len(texts))
+            return [self._translate_uncached(text) for text in texts]
+        
+        for text, translated_text in zip(texts, parts):
+            self.translation_cache.set(text, self.source, self.target, translated_text)
+        return parts
+    
+    def _translate_unique(self, texts: List[str], progress_callback: ProgressCallback = None,
+                          max_workers: int = None) -> Tuple[List[str], int]:
+        """
+        翻譯不重複的文字列表，以執行緒池同時送出多個請求，結果依原始順序返回
+        
+        合併模式下先查詢快取，只將未快取的文字合併成請求。
+        
+        Args:
+            texts: 要翻譯的文字列表
+            progress_callback: 進度回呼函數，參數為 (已翻譯數, 總數)；依時間與百分比節流
+            max_workers: 同時進行中的請求上限（可選，覆蓋初始設定）
+            
+        Returns:
+            Tuple[List[str], int]: (翻譯後的文字列表, 本次送出的翻譯請求數)
+        """
+        translated_texts: List[str] = [""] * len(texts)
+        progress = ThrottledProgress(progress_callback, len(texts))
+        max_workers = max(1, max_workers or self.max_workers)
+        done = 0
+        requests = 0
+        
+        # 每個工作單位為一組文字位置：逐筆模式每組一筆，合併模式每組為一次合併請求
+        if self.pack_requests:
+            pending = []
+            for i, text in enumerate(texts):
+                cached = self.translation_cache.get(text, self.source, self.target) if text else ""
+                if cached is None:
+                    pending.append(i)
+                else:
+                    translated_texts[i] = cached
+                    done += 1
+            units = self._pack_positions(texts, pending)
+        else:
+            units = [[i] for i in range(len(texts))]
+        progress.update(done)
+        
+        def translate_unit(positions: List[int]) -> Tuple[List[str], int]:
+            # 每個工作單位在單一執行緒內完成，以執行緒區域計數取得本單位送出的請求數
+            self._local.requests = 0
+            if self.pack_requests:
+                results = self._translate_pack([texts[i] for i in positions])
+            else:
+                results = [self.translate_to_english(texts[positions[0]])]
+            return results, self._local.requests
+        
+        def collect(positions: List[int], unit_result: Tuple[List[str], int]):
+            nonlocal done, requests
+            results, unit_requests = unit_result
+            for i, translated_text in zip(positions, results):
+                translated_texts[i] = translated_text
+            done += len(positions)
+            requests += unit_requests
+            progress.update(done)
+        
+        if max_workers == 1 or len(units) <= 1:
+            for positions in units:
+                collect(positions, translate_unit(positions))
+            return translated_texts, requests
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(translate_unit, positions): positions for positions in units}
+            for future in as_completed(futures):
+                collect(futures[future], future.result())
+        
+        return translated_texts, requests
+    
+    def translate_series(self, names: pd.Series, progress_callback: ProgressCallback = None,
+                         max_workers: int = None,
+                         return_stats: bool = False) -> Union[pd.Series, Tuple[pd.Series, Dict[str, int]]]:
+        """
+        批次翻譯產品名稱：先正規化並去除重複，只翻譯不重複的名稱，再對應回每一列
+        
+        Args:
+            names: 產品名稱
+            progress_callback: 進度回呼函數，參數為 (已翻譯的不重複名稱數, 不重複名稱總數)
+            max_workers: 同時進行中的請求上限（可選，覆蓋初始設定）
+            return_stats: 是否一併返回本次呼叫的去重統計（服務由多個 session 共用時，
+                          last_batch_stats 可能已被其他呼叫覆蓋）
+            
+        Returns:
+            pd.Series: 翻譯後的名稱，索引與輸入相同；return_stats 為 True 時返回
+            (翻譯後的名稱, 去重統計 {'total_names', 'unique_names', 'api_calls_saved', 'api_requests'})
+        """
+        # 只正規化原始名稱中不重複的值，再依正規化結果合併近似重複的名稱
+        raw_codes, raw_uniques = pd.factorize(names, use_na_sentinel=False)
+        normalized = [normalize_product_name(name) or None for name in raw_uniques]
+        norm_codes, norm_uniques = pd.factorize(pd.Series(normalized, dtype=object))
+        
+        translated_texts, requests = self._translate_unique(list(norm_uniques), progress_callback, max_workers)
+        translations = np.asarray(translated_texts + [""], dtype=object)
+        # 以位置向量化對應回每一列（-1 為空白名稱，對應到最後的空字串）
+        codes = norm_codes[raw_codes]
+        
+        # 空白名稱不需翻譯，不列入節省的 API 呼叫數
+        api_calls_saved = int(np.count_nonzero(codes >= 0)) - len(norm_uniques)
+        stats = {
+            'total_names': len(names),
+            'unique_names': len(norm_uniques),
+            'api_calls_saved': api_calls_saved,
+            'api_requests': requests
+        }
+        self.last_batch_stats = stats
+        logger.info("批次翻譯: %d 筆名稱，%d 筆不重複，節省 %d 次 API 呼叫",
+                    len(names), len(norm_uniques), api_calls_saved)
+        translated = pd.Series(translations[codes], index=names.index, dtype=object)
+        return (translated, stats) if return_stats else translated
+    
+    def translate_batch(self, texts: List[str], show_progress: bool = None,
+                        progress_callback: ProgressCallback = None, max_workers: int = None) -> List[str]:
+        """
+        批次翻譯文字列表，正規化並去除重複後同時送出多個請求，結果依原始順序返回
         
         Args:
             texts: 要翻譯的文字列表
-            show_progress: 是否顯示進度條
+            show_progress: 已棄用且不再使用，請改用 progress_callback（保留此參數與位置以相容舊呼叫）
+            progress_callback: 進度回呼函數，參數為 (已翻譯的不重複名稱數, 不重複名稱總數)
+            max_workers: 同時進行中的請求上限（可選，覆蓋初始設定）
             
         Returns:
             List[str]: 翻譯後的文字列表
         """
-        translated_texts = []
+        progress_callback = resolve_progress_callback(show_progress, progress_callback)
+        return self.translate_series(pd.Series(texts, dtype=object), progress_callback, max_workers).tolist()
+    
+    def export_cache(self, destination: Any, compress: bool = None) -> int:
+        """
+        將翻譯快取匯出為 JSON Lines 檔案
         
-        if show_progress:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+        Args:
+            destination: 檔案路徑或可寫入位元組的檔案物件
+            compress: 是否以 gzip 壓縮（可選，檔案路徑預設依 .gz 副檔名判斷，檔案物件預設壓縮）
+            
+        Returns:
+            int: 匯出的筆數
+        """
+        return export_cache(self.translation_cache, destination, compress)
+    
+    def import_cache(self, source: Any) -> int:
+        """
+        從 JSON Lines 檔案（可為 gzip 壓縮）匯入翻譯快取
         
-        for i, text in enumerate(texts):
-            translated_text = self.translate_to_english(text)
-            translated_texts.append(translated_text)
+        Args:
+            source: 檔案路徑或可讀取位元組的檔案物件
             
-            if show_progress:
-                progress = (i + 1) / len(texts)
-                progress_bar.progress(progress)
-                status_text.text(f"翻譯進度: {i + 1}/{len(texts)} ({progress:.1%})")
+        Returns:
+            int: 匯入的筆數
+        """
+        count = import_cache(self.translation_cache, source)
+        logger.info("已匯入 %d 筆翻譯快取", count)
+        return count
+    
+    def warm_up(self, paths: List[str], background: bool = True) -> Optional[threading.Thread]:
+        """
+        預先翻譯產品目錄檔案（CSV、Excel、Parquet 或 Feather）中的產品名稱，寫入翻譯快取
         
-        if show_progress:
-            progress_bar.empty()
-            status_text.empty()
+        檔案以上傳檔案相同的讀取器讀取（自動偵測 CSV 編碼，欄位名稱不分大小寫）。
         
-        return translated_texts
+        Args:
+            paths: 產品目錄檔案路徑，檔案需有 product_name 欄位
+            background: 是否在背景執行緒執行
+            
+        Returns:
+            threading.Thread or None: 背景執行緒（同步執行時為 None）
+        """
+        def run():
+            for path in paths:
+                try:
+                    # 延遲匯入：檔案讀取模組依賴 Streamlit，翻譯核心模組本身不需要
+                    if __package__:
+                        from .file_handler import FileHandler
+                    else:
+                        from file_handler import FileHandler
+                    df = FileHandler.read_path(path)
+                    columns = {col.lower(): col for col in df.columns if isinstance(col, str)}
+                    _, stats = self.translate_series(df[columns['product_name']], return_stats=True)
+                    logger.info("翻譯快取預熱完成: %s (%s)", path, stats)
+                except Exception as e:
+                    logger.warning("翻譯快取預熱失敗: %s -> %s", path, e)
+        
+        if not background:
+            run()
+            return None
+        
+        thread = threading.Thread(target=run, name='translation-warm-up', daemon=True)
+        thread.start()
+        return thread
+    
+    @classmethod
+    def from_env(cls, **kwargs) -> 'TranslationService':
+        """
+        建立翻譯服務，並依環境變數匯入快取種子檔案及在背景預熱產品目錄
+        
+        環境變數 TRANSLATION_CACHE_SEED 為啟動時匯入的快取檔案，
+        TRANSLATION_WARMUP_FILES 為以逗號分隔的產品目錄檔案。
+        
+        Args:
+            **kwargs: 傳給建構子的參數
+            
+        Returns:
+            TranslationService: 翻譯服務
+        """
+        service = cls(**kwargs)
+        
+        seed = os.getenv('TRANSLATION_CACHE_SEED')
+        if seed:
+            try:
+                service.import_cache(seed)
+            except (OSError, ValueError) as e:
+                logger.warning("無法匯入翻譯快取種子檔案: %s -> %s", seed, e)
+        
+        warm_up_files = [path.strip() for path in os.getenv('TRANSLATION_WARMUP_FILES', '').split(',') if path.strip()]
+        if warm_up_files:
+            service.warm_up(warm_up_files)
+        return service
     
     def clear_cache(self):
-        """清除翻譯快取"""
+        """清除翻譯快取（SQLite 快取由同一台機器上的所有 session 共用，會一併清除）"""
         self.translation_cache.clear()
-        st.success("✅ 翻譯快取已清除")
     
     def get_cache_info(self) -> dict:
         """
@@ -98,7 +523,6 @@ class TranslationService:
         Returns:
             dict: 快取統計資訊
         """
-        return {
-            'cache_size': len(self.translation_cache),
-            'cached_translations': list(self.translation_cache.keys())[:10]  # 只顯示前10個
-        }
+        info = self.translation_cache.info()
+        info['cached_translations'] = self.translation_cache.sample(10)  # 只顯示最近使用的10個
+        return info
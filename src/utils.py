@@ -7,11 +7,16 @@
 
 import pandas as pd
 import streamlit as st
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 import plotly.express as px
 import plotly.graph_objects as go
 import logging
 
+try:
+    from .file_handler import FileHandler
+except ImportError:
+    from file_handler import FileHandler
+
 
 def format_number(num: float, decimal_places: int = 2) -> str:
     """
@@ -139,7 +144,7 @@ def create_similarity_vs_price_chart(matched_df: pd.DataFrame) -> go.Figure:
 
 def display_data_summary(df: pd.DataFrame, title: str = "資料摘要"):
     """
-    顯示資料摘要資訊
+    顯示資料摘要資訊（取自快取的資料概況，不重新掃描資料）
     
     Args:
         df: 要顯示的資料框
@@ -150,28 +155,29 @@ def display_data_summary(df: pd.DataFrame, title: str = "資料摘要"):
         return
     
     st.subheader(title)
+    profile = FileHandler.get_profile(df)
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("總筆數", len(df))
+        st.metric("總筆數", profile['total_rows'])
     
     with col2:
-        st.metric("欄位數", len(df.columns))
+        st.metric("欄位數", profile['total_columns'])
     
     if 'product_location_country' in df.columns:
         with col3:
-            st.metric("國家數", df['product_location_country'].nunique())
+            st.metric("國家數", profile['unique_countries'])
     
     if 'price' in df.columns:
         with col4:
-            avg_price = df['price'].mean()
-            st.metric("平均價格", f"${avg_price:.2f}" if pd.notna(avg_price) else "N/A")
+            avg_price = profile['price_range']['mean']
+            st.metric("平均價格", f"${avg_price:.2f}" if avg_price is not None else "N/A")
 
 
 def display_missing_values(df: pd.DataFrame):
     """
-    顯示缺失值資訊
+    顯示缺失值資訊（取自快取的資料概況）
     
     Args:
         df: 要檢查的資料框
@@ -179,10 +185,10 @@ def display_missing_values(df: pd.DataFrame):
     if df is None:
         return
     
-    missing_data = df.isnull().sum()
-    if missing_data.sum() > 0:
+    missing_data = {col: count for col, count in FileHandler.get_profile(df)['missing_values'].items() if count > 0}
+    if missing_data:
         st.warning("⚠️ 發現缺失值:")
-        for col, count in missing_data[missing_data > 0].items():
+        for col, count in missing_data.items():
             st.write(f"  - {col}: {count} 筆缺失")
     else:
         st.success("✅ 無缺失值")
@@ -190,7 +196,7 @@ def display_missing_values(df: pd.DataFrame):
 
 def validate_data_quality(df: pd.DataFrame) -> List[str]:
     """
-    驗證資料品質並返回問題列表
+    驗證資料品質並返回問題列表（取自快取的資料概況）
     
     Args:
         df: 要驗證的資料框
@@ -198,37 +204,10 @@ def validate_data_quality(df: pd.DataFrame) -> List[str]:
     Returns:
         List[str]: 發現的問題列表
     """
-    issues = []
-    
-    if df is None or len(df) == 0:
-        issues.append("資料框為空")
-        return issues
-    
-    # 檢查必要欄位
-    required_columns = ['product_id', 'product_name', 'product_location_country', 'price']
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        issues.append(f"缺少必要欄位: {', '.join(missing_columns)}")
-    
-    # 檢查重複的產品ID
-    if 'product_id' in df.columns:
-        duplicate_ids = df['product_id'].duplicated().sum()
-        if duplicate_ids > 0:
-            issues.append(f"發現 {duplicate_ids} 個重複的產品ID")
-    
-    # 檢查空的產品名稱
-    if 'product_name' in df.columns:
-        empty_names = df['product_name'].isnull().sum()
-        if empty_names > 0:
-            issues.append(f"發現 {empty_names} 個空的產品名稱")
-    
-    # 檢查負價格
-    if 'price' in df.columns:
-        negative_prices = (df['price'] < 0).sum()
-        if negative_prices > 0:
-            issues.append(f"發現 {negative_prices} 個負價格")
+    if df is None:
+        return ["資料框為空"]
     
-    return issues
+    return list(FileHandler.get_profile(df)['quality_issues'])
 
 
 def format_currency(amount: float, currency: str = "USD") -> str:
@@ -257,6 +236,78 @@ def format_currency(amount: float, currency: str = "USD") -> str:
     return f"{symbol}{amount:,.2f}"
 
 
+class StreamlitProgress:
+    """將核心模組的進度回呼顯示為 Streamlit 進度條"""
+    
+    def __init__(self, label: str = "進度"):
+        """
+        初始化進度條
+        
+        Args:
+            label: 進度文字的標籤
+        """
+        self.label = label
+        self.progress_bar = st.progress(0)
+        self.status_text = st.empty()
+    
+    def __call__(self, done: int, total: int) -> None:
+        """
+        更新進度條
+        
+        Args:
+            done: 已處理數量
+            total: 總數量
+        """
+        progress = done / total if total else 1.0
+        self.progress_bar.progress(min(progress, 1.0))
+        self.status_text.text(f"{self.label}: {done}/{total} ({progress:.1%})")
+    
+    def close(self) -> None:
+        """移除進度條"""
+        self.progress_bar.empty()
+        self.status_text.empty()
+
+
+# Streamlit 1.52 起 st.download_button 的 data 可傳入函式，按下下載時才執行
+DEFERRED_DOWNLOAD = tuple(int(part) for part in st.__version__.split('.')[:2]) >= (1, 52)
+
+
+def lazy_download_button(label: str, build: Callable[[], bytes], file_name: str, mime: str, key: str,
+                         source: Optional[pd.DataFrame] = None) -> None:
+    """
+    顯示延遲產生檔案的下載按鈕，重新執行腳本時不會產生檔案
+    
+    舊版 Streamlit 不支援延遲產生，改為先按「準備」按鈕再顯示下載按鈕；
+    準備狀態記錄結果的雜湊值，結果變更後需重新準備，不會在每次重新執行時產生新結果的檔案。
+    
+    Args:
+        label: 按鈕文字
+        build: 返回檔案二進位資料的函式（例如 FileHandler.lazy_export）
+        file_name: 下載的檔案名稱
+        mime: 檔案的 MIME 類型
+        key: 按鈕的唯一鍵值
+        source: 產生檔案的結果資料（可選，舊版 Streamlit 用於保留準備狀態；未提供時只在按下準備的該次執行顯示）
+    """
+    if DEFERRED_DOWNLOAD:
+        st.download_button(label=label, data=build, file_name=file_name, mime=mime, key=key, on_click='ignore')
+        return
+    
+    ready_key = f"{key}_ready"
+    prepared = st.session_state.get(ready_key)
+    if prepared is not None and prepared != FileHandler.result_fingerprint(source):
+        # 結果已變更：清除準備狀態，重新按「準備」後才產生新結果的檔案
+        del st.session_state[ready_key]
+        prepared = None
+    
+    if prepared is None:
+        if not st.button(f"準備{label}", key=f"{key}_prepare"):
+            return
+        if source is not None:
+            st.session_state[ready_key] = FileHandler.result_fingerprint(source)
+    
+    st.download_button(label=label, data=build(), file_name=file_name, mime=mime, key=key)
+
+
 def setup_logging(level: int = logging.INFO) -> None:
     """
     設定基礎日誌輸出（供雲端與本機使用）
@@ -274,3 +325,15 @@ def setup_logging(level: int = logging.INFO) -> None:
         format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
     )
     logging.getLogger(__name__).info("Logging initialized")
+
+
+def enable_copy_on_write() -> None:
+    """
+    啟用 pandas 的寫入時複製（Copy-on-Write）
+    
+    上傳的資料由所有 session 共用，新增欄位時以 assign 產生新的 DataFrame；
+    pandas 3 以前未啟用寫入時複製時 assign 會深層複製所有欄位，啟用後只會共用原本的欄位。
+    pandas 3 起寫入時複製一律啟用，不需設定（設定該選項會出現棄用警告）。
+    """
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.options.mode.copy_on_write = True
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+檔案讀取測試
+檢查有無 pyarrow 時 CSV 讀取結果一致，以及 xlsx 逐列讀取與 pandas 的列數一致
+"""
+
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from src import file_handler
+from src.file_handler import FileHandler
+
+CSV_WITH_PADDED_IDS = (
+    "Product_ID,product_name,product_location_country,price\n"
+    "001,東京 一日遊,JP,100\n"
+    "1,大阪門票,JP,200\n"
+    "0042,曼谷夜市,TH,\n"
+)
+
+
+@pytest.mark.parametrize('has_pyarrow', [True, False])
+@pytest.mark.parametrize('encoding', ['utf-8', 'big5'])
+def test_read_csv_keeps_leading_zeros(monkeypatch, encoding, has_pyarrow):
+    if has_pyarrow and not file_handler.HAS_PYARROW:
+        pytest.skip("未安裝 pyarrow")
+    monkeypatch.setattr(file_handler, 'HAS_PYARROW', has_pyarrow)
+
+    df = FileHandler.read_csv(io.BytesIO(CSV_WITH_PADDED_IDS.encode(encoding)))
+
+    # 001 與 1 是不同的產品編號，不可因型別推斷而合併
+    assert df['Product_ID'].tolist() == ['001', '1', '0042']
+    assert df['product_name'].tolist() == ['東京 一日遊', '大阪門票', '曼谷夜市']
+    assert df['price'].iloc[:2].tolist() == [100.0, 200.0]
+    assert df['price'].isna().iloc[2]
+
+
+def test_read_xlsx_rows_matches_pandas_row_count(tmp_path):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['product_id', 'product_name', 'product_location_country', 'price'])
+    sheet.append(['001', '東京 一日遊', 'JP', 100])
+    sheet.append([None, None, None, None])  # 中間的空白列保留
+    sheet.append(['002', '大阪門票', 'JP', 200])
+    # 結尾只有格式、沒有內容的列：唯讀模式仍會回傳，pandas 會去除
+    for row in range(5, 15):
+        for column in range(1, 5):
+            sheet.cell(row=row, column=column).font = openpyxl.styles.Font(bold=True)
+    path = tmp_path / 'catalog.xlsx'
+    workbook.save(path)
+
+    df = FileHandler._read_xlsx_rows(str(path))
+    expected = pd.read_excel(path, engine='openpyxl', usecols=FileHandler._is_wanted_column)
+
+    assert len(df) == len(expected) == 3
+    assert df['product_id'].tolist()[::2] == ['001', '002']
+    assert df.iloc[1].isna().all()
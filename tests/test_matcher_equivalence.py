@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比對引擎等價性測試
+以最單純的集合運算逐筆計算 Jaccard 相似度作為參考結果，檢查每個引擎在不同平行行程數與前 K 名設定下的結果
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.matcher import ProductMatcher
+from src.translation_backends import StubBackend
+from src.translator import TranslationService
+
+WORDS = ['tokyo', 'osaka', 'kyoto', 'day', 'tour', 'ticket', 'pass', 'park', 'temple', 'night',
+         'market', 'cruise', 'bus', 'hot', 'spring', 'disney', 'island', 'bangkok']
+THRESHOLD = 0.3
+MAX_TOKEN_DIFF = 3
+
+# 精確比對引擎的結果必須與參考結果完全相同；MinHash 為近似比對，另外檢查
+EXACT_ENGINES = [engine for engine in ProductMatcher.ENGINES if engine != 'minhash']
+
+
+def make_catalog(size: int, seed: int, countries) -> pd.DataFrame:
+    """
+    產生測試用產品目錄：詞彙表很小，因此有大量共同詞彙、同分與重複名稱
+
+    Args:
+        size: 產品數
+        seed: 亂數種子
+        countries: 產品所在國家的候選值
+
+    Returns:
+        pd.DataFrame: 產品目錄（含 product_name_en）
+    """
+    rng = np.random.default_rng(seed)
+    names = [' '.join(rng.choice(WORDS, rng.integers(1, 6))) for _ in range(size)]
+    names[::37] = [None] * len(names[::37])
+    names[5::41] = [''] * len(names[5::41])
+    return pd.DataFrame({
+        'product_id': [f'{seed}-{i}' for i in range(size)],
+        'product_name': names,
+        'product_name_en': names,
+        'product_location_country': rng.choice(list(countries), size),
+        'price': rng.integers(100, 5000, size).astype(float)
+    })
+
+
+def tokens(name) -> set:
+    """參考斷詞：小寫後以空白切開的詞彙集合"""
+    return set(name.lower().split()) if isinstance(name, str) else set()
+
+
+def reference_candidates(row_a, df_b: pd.DataFrame):
+    """
+    逐一計算同國家供應商B產品的相似度，依 (相似度由高到低, B位置由小到大) 排序
+
+    Args:
+        row_a: 供應商A的產品
+        df_b: 供應商B的產品目錄
+
+    Returns:
+        List[Tuple[float, str]]: (相似度, 供應商B產品編號)，只含有共同詞彙且詞彙數差異不超過上限的組合
+    """
+    tokens_a = tokens(row_a.product_name_en)
+    candidates = []
+    for position, row_b in enumerate(df_b.itertuples(index=False)):
+        if row_b.product_location_country != row_a.product_location_country:
+            continue
+        tokens_b = tokens(row_b.product_name_en)
+        if not tokens_a & tokens_b or abs(len(tokens_a) - len(tokens_b)) > MAX_TOKEN_DIFF:
+            continue
+        score = len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+        candidates.append((-score, position, row_b.product_id))
+    candidates.sort()
+    return [(-neg_score, product_id) for neg_score, _, product_id in candidates]
+
+
+def reference_matches(df_a: pd.DataFrame, df_b: pd.DataFrame, top_k) -> set:
+    """
+    參考結果：每個供應商A產品取前 K 名（未指定時取最佳比對），只保留相似度不低於門檻者
+
+    Returns:
+        set: {(A產品編號, B產品編號, 相似度, 名次)}，未指定 top_k 時名次為 None
+    """
+    expected = set()
+    for row_a in df_a.itertuples(index=False):
+        for rank, (score, product_id) in enumerate(reference_candidates(row_a, df_b)[:top_k or 1], start=1):
+            if score >= THRESHOLD:
+                expected.add((row_a.product_id, product_id, round(score, 9), rank if top_k else None))
+    return expected
+
+
+def as_set(results: pd.DataFrame) -> set:
+    """將比對結果轉為與參考結果相同格式的集合"""
+    ranks = results['rank'] if 'rank' in results.columns else [None] * len(results)
+    return {
+        (a, b, round(score, 9), None if rank is None else int(rank))
+        for a, b, score, rank in zip(results['vendor_A_product_id'], results['vendor_B_product_id'],
+                                     results['jaccard_score'], ranks)
+    }
+
+
+@pytest.fixture(scope='module')
+def catalogs():
+    # VN 只出現在供應商A，這些產品不應有任何比對
+    df_a = make_catalog(300, seed=1, countries=('JP', 'TH', 'KR', 'VN'))
+    df_b = make_catalog(400, seed=2, countries=('JP', 'TH', 'KR'))
+    return df_a, df_b
+
+
+def run_matcher(df_a: pd.DataFrame, df_b: pd.DataFrame, engine: str, n_jobs: int, top_k) -> pd.DataFrame:
+    """以小分片與小批次設定執行比對，讓分片、平行與稀疏矩陣分批的程式路徑都被執行"""
+    matcher = ProductMatcher(THRESHOLD, MAX_TOKEN_DIFF, engine=engine, n_jobs=n_jobs, top_k=top_k,
+                             sparse_chunk_size=40, sparse_max_nnz=500)
+    return matcher.compare_products(df_a, df_b)
+
+
+@pytest.mark.parametrize('top_k', [None, 3])
+@pytest.mark.parametrize('n_jobs', [1, 2])
+@pytest.mark.parametrize('engine', EXACT_ENGINES)
+def test_exact_engines_match_reference(catalogs, engine, n_jobs, top_k):
+    df_a, df_b = catalogs
+    expected = reference_matches(df_a, df_b, top_k)
+    results = run_matcher(df_a, df_b, engine, n_jobs, top_k)
+
+    assert expected, "測試資料應產生比對結果"
+    assert len(results) == len(expected)
+    assert as_set(results) == expected
+
+
+@pytest.mark.parametrize('top_k', [None, 3])
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_minhash_returns_exact_scores_for_valid_pairs(catalogs, n_jobs, top_k):
+    df_a, df_b = catalogs
+    names_a = dict(zip(df_a['product_id'], df_a['product_name_en']))
+    names_b = dict(zip(df_b['product_id'], df_b['product_name_en']))
+    best = {row_a.product_id: reference_candidates(row_a, df_b) for row_a in df_a.itertuples(index=False)}
+
+    results = run_matcher(df_a, df_b, 'minhash', n_jobs, top_k)
+
+    assert len(results) > 0
+    assert (results['jaccard_score'] >= THRESHOLD).all()
+    for a, b, score in zip(results['vendor_A_product_id'], results['vendor_B_product_id'], results['jaccard_score']):
+        # 近似比對可能漏掉候選，但回報的組合必須是有效組合，且相似度為精確值
+        assert b in {product_id for _, product_id in best[a]}
+        tokens_a, tokens_b = tokens(names_a[a]), tokens(names_b[b])
+        assert score == pytest.approx(len(tokens_a & tokens_b) / len(tokens_a | tokens_b))
+    if top_k:
+        assert results.groupby('vendor_A_product_id')['rank'].max().le(top_k).all()
+
+
+@pytest.mark.parametrize('lazy_translation', [False, True])
+def test_translation_fills_only_missing_english_names(lazy_translation):
+    translator = TranslationService(backend=StubBackend({'東京 一日遊': 'tokyo day tour', '大阪 門票': 'osaka ticket'}),
+                                    rate_limit=1e6)
+    df_a = pd.DataFrame({
+        'product_id': ['a1', 'a2', 'a3'],
+        'product_name': ['東京 一日遊', '大阪 門票', '京都 寺廟'],
+        'product_name_en': [None, '  ', 'kyoto temple'],
+        'product_location_country': ['JP'] * 3,
+        'price': [100.0, 200.0, 300.0]
+    })
+    df_b = pd.DataFrame({
+        'product_id': ['b1', 'b2', 'b3'],
+        'product_name': ['tokyo day tour', 'osaka ticket', 'kyoto temple'],
+        'product_location_country': ['JP'] * 3,
+        'price': [100.0, 200.0, 300.0]
+    })
+
+    matcher = ProductMatcher(THRESHOLD, MAX_TOKEN_DIFF)
+    results = matcher.compare_products(df_a, df_b, translator=translator, lazy_translation=lazy_translation)
+
+    # 空值與空白的英文名稱需翻譯，已提供的英文名稱保留；延遲翻譯與預先翻譯的結果相同
+    assert as_set(results) == {('a1', 'b1', 1.0, None), ('a2', 'b2', 1.0, None), ('a3', 'b3', 1.0, None)}
+    assert df_a['product_name_en'].isna().iloc[0]
+    assert df_a['product_name_en'].iloc[1:].tolist() == ['  ', 'kyoto temple']
+
+
+def test_translation_falls_back_to_translate_to_english():
+    class WordTranslator:
+        """只提供 translate_to_english 的翻譯器"""
+
+        def translate_to_english(self, text: str) -> str:
+            return {'東京 一日遊': 'tokyo day tour'}.get(text, text)
+
+    df_a = pd.DataFrame({'product_id': ['a1', 'a2'], 'product_name': ['東京 一日遊', None],
+                         'product_location_country': ['JP', 'JP'], 'price': [100.0, 200.0]})
+    df_b = pd.DataFrame({'product_id': ['b1'], 'product_name_en': ['tokyo day tour'], 'product_name': ['東京 一日遊'],
+                         'product_location_country': ['JP'], 'price': [100.0]})
+
+    results = ProductMatcher(THRESHOLD, MAX_TOKEN_DIFF).compare_products(df_a, df_b, translator=WordTranslator())
+
+    assert as_set(results) == {('a1', 'b1', 1.0, None)}
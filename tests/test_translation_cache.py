@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+翻譯快取測試
+檢查匯入格式錯誤的檔案時略過錯誤資料或回報 ValueError，不會寫入無效的翻譯
+"""
+
+import gzip
+import io
+import json
+
+import pytest
+
+from src.translation_cache import SQLiteTranslationCache, import_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SQLiteTranslationCache(str(tmp_path / 'cache.sqlite3'))
+    yield cache
+    cache.close()
+
+
+def jsonl(*records) -> bytes:
+    return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+
+
+def test_import_skips_records_without_string_fields(cache):
+    data = jsonl(
+        {'source': 'zh-TW', 'target': 'en', 'text': '東京', 'translation': 'Tokyo'},
+        {'source': 'zh-TW', 'target': 'en', 'text': '大阪', 'translation': None},
+        {'source': 'zh-TW', 'target': 'en', 'text': '', 'translation': 'empty'},
+        {'source': 'zh-TW', 'target': 'en', 'text': 1, 'translation': 'one'},
+        ['not', 'a', 'record']
+    )
+
+    assert import_cache(cache, io.BytesIO(gzip.compress(data))) == 1
+    assert cache.get('東京', 'zh-TW', 'en') == 'Tokyo'
+    assert cache.get('大阪', 'zh-TW', 'en') is None
+
+
+@pytest.mark.parametrize('data', [
+    '東京'.encode('big5'),                  # 非 UTF-8
+    b'\x1f\x8b' + b'not really gzip',       # gzip 標頭但內容無效
+    gzip.compress(jsonl({'text': 'x'}))[:-8]  # 截斷的 gzip
+])
+def test_import_reports_undecodable_files_as_value_error(cache, data):
+    with pytest.raises(ValueError):
+        import_cache(cache, io.BytesIO(data))
+    assert len(cache) == 0
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+翻譯服務測試
+以本機翻譯替身（StubBackend）檢查請求數統計，不需網路
+"""
+
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from src.translation_backends import StubBackend
+from src.translator import TranslationService
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('pack_requests', [False, True])
+def test_glossary_terms_do_not_count_as_api_requests(pack_requests):
+    service = TranslationService(backend=StubBackend(), use_glossary=True, rate_limit=1e6,
+                                 pack_requests=pack_requests)
+
+    translated, stats = service.translate_series(
+        pd.Series(['東京 一日遊', '大阪 門票', '曼谷 夜市']), return_stats=True
+    )
+
+    # 全部由詞彙表在本機翻譯：不送出請求，也不佔用限流額度
+    assert translated.tolist() == ['Tokyo day tour', 'Osaka ticket', 'Bangkok night market']
+    assert stats['api_requests'] == 0
+    assert service.backend.remote_calls == 0
+
+    _, stats = service.translate_series(pd.Series(['東京 未知景點', '清水寺 參觀']), return_stats=True)
+    assert stats['api_requests'] == service.backend.remote_calls > 0
+
+
+def test_translator_imports_without_streamlit():
+    # 翻譯核心模組需可在沒有 Streamlit 的環境（批次腳本、排程）中匯入
+    code = "import sys; sys.modules['streamlit'] = None; import src.translator"
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=ROOT)
+
+
+def test_warm_up_reads_catalog_file(tmp_path):
+    path = tmp_path / 'catalog.csv'
+    path.write_text("Product_Name,product_location_country\n清水寺 參觀,JP\n", encoding='utf-8')
+    service = TranslationService(backend=StubBackend(), rate_limit=1e6)
+
+    service.warm_up([str(path)], background=False)
+    calls = service.backend.calls
+
+    # 預熱後已寫入快取，再次翻譯不需送出請求
+    assert calls > 0
+    service.translate_series(pd.Series(['清水寺 參觀']))
+    assert service.backend.calls == calls